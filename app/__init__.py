@@ -1,4 +1,5 @@
 import os
+import click
 from flask import Flask
 from .config import Config
 from .extensions import db
@@ -12,7 +13,8 @@ except Exception:  # pragma: no cover
 
 
 def create_app():
-    app = Flask(__name__, instance_relative_config=True)
+    # INSTANCE_PATH relocates instance/ (SQLite default, PDF jobs, file sessions), e.g. for benchmarks
+    app = Flask(__name__, instance_relative_config=True, instance_path=os.getenv("INSTANCE_PATH") or None)
 
     # Ensure instance folder exists for SQLite default
     try:
@@ -25,6 +27,12 @@ def create_app():
 
     app.config.from_object(Config())
 
+    # Client address from X-Forwarded-* behind trusted proxies (rate limits key on it)
+    hops = app.config.get("TRUSTED_PROXY_HOPS", 0)
+    if hops:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
     # Default DB: SQLite under instance/ unless DATABASE_URL or MySQL env set
     database_url = os.getenv("DATABASE_URL")
     if database_url:
@@ -44,125 +52,66 @@ def create_app():
             sqlite_path = os.getenv("SQLITE_PATH") or os.path.join(app.instance_path, "ministore.sqlite3")
             app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{sqlite_path}"
 
-    # Fallback to SQLite if the configured DB is unavailable
-    try:
-        from sqlalchemy import create_engine, text as _text
-        uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
-        if not uri.startswith("sqlite"):
-            test_engine = create_engine(uri)
-            with test_engine.connect() as conn:
-                conn.execute(_text("select 1"))
-    except Exception as e:
-        sqlite_path = os.path.join(app.instance_path, "ministore.sqlite3")
-        app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{sqlite_path}"
-        print(f"[WARN] DB connection failed; falling back to SQLite at {sqlite_path}. Error: {e}")
+    # Optional eager probe (DB_PROBE=1): fall back to SQLite if the configured DB is unavailable.
+    # Off by default so worker boots don't pay an extra connection round-trip.
+    if os.getenv("DB_PROBE", "0") == "1":
+        try:
+            from sqlalchemy import create_engine, text as _text
+            uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
+            if not uri.startswith("sqlite"):
+                test_engine = create_engine(uri)
+                with test_engine.connect() as conn:
+                    conn.execute(_text("select 1"))
+                test_engine.dispose()
+        except Exception as e:
+            sqlite_path = os.path.join(app.instance_path, "ministore.sqlite3")
+            app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{sqlite_path}"
+            print(f"[WARN] DB connection failed; falling back to SQLite at {sqlite_path}. Error: {e}")
 
     # Sensible defaults
     app.config.setdefault("SQLALCHEMY_TRACK_MODIFICATIONS", False)
     app.config.setdefault("SECRET_KEY", os.getenv("SECRET_KEY", "dev-secret-key"))
 
+    # Engine profile: pool sizing for MySQL, pragmas for SQLite (DB_PROFILE + overrides)
+    from .db_profiles import engine_options, install_sqlite_pragmas, resolve_profile
+    profile = resolve_profile()
+    app.config["DB_PROFILE"] = profile
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"], profile)
+    )
+
     # Init extensions
     db.init_app(app)
 
     # Ensure models are imported before creating tables
     from . import models  # noqa: F401
+    from . import versions  # noqa: F401  (session hooks that bump data versions)
+    # Cached rows, metrics and rendered bodies belong to whichever database filled them
+    from .cache import reset_caches
+    reset_caches()
+    versions.reset_response_cache()
 
-    # Create tables automatically on startup (idempotent)
-    from flask import g, session, has_request_context
-    from sqlalchemy import event
+    # Startup reads one schema_version row; migrations only run when it is behind
     with app.app_context():
-        db.create_all()
-
-        # Attach SQL listener within app context to access engine
-        if not app.config.get("_SQL_LISTENER_SET") and os.getenv("DISABLE_SQL_LOG", "0") != "1":
-            def _log_sql(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
-                if has_request_context():
-                    try:
-                        g._sql_log.append((statement, parameters))
-                    except Exception:
-                        pass
-
-            event.listen(db.engine, "before_cursor_execute", _log_sql)
-            app.config["_SQL_LISTENER_SET"] = True
-
-    @app.before_request
-    def _sql_log_init():
-        g._sql_log = []
-
-    @app.after_request
-    def _sql_log_store(response):
-        def _fmt_value(v):
-            from datetime import date, datetime
-            if v is None:
-                return "NULL"
-            if isinstance(v, (int, float)):
-                return str(v)
-            if isinstance(v, (date, datetime)):
-                return f"'{v.isoformat()}'"
-            if isinstance(v, bool):
-                return '1' if v else '0'
-            # Escape single quotes for SQL display
-            s = str(v).replace("'", "''")
-            return f"'{s}'"
-
-        def _render_sql(stmt: str, params):
-            import re
-            s = str(stmt)
+        install_sqlite_pragmas(db.engine, profile)
+        if app.config.get("AUTO_MIGRATE", True):
+            from .migrations import upgrade
             try:
-                # Dict param styles: %(name)s or :name
-                if isinstance(params, dict) and params:
-                    # pyformat: %(name)s
-                    def repl_pyformat(m):
-                        key = m.group(1)
-                        return _fmt_value(params.get(key))
-                    s_py = re.sub(r"%\((\w+)\)s", repl_pyformat, s)
-                    # named: :name
-                    def repl_named(m):
-                        key = m.group(1)
-                        return _fmt_value(params.get(key))
-                    s_named = re.sub(r":(\w+)", repl_named, s_py)
-                    return s_named
-
-                # Positional param styles: ? or %s
-                if isinstance(params, (list, tuple)) and params:
-                    vals = list(params)
-                    # First try qmark '?'
-                    if '?' in s:
-                        out = []
-                        it = iter(vals)
-                        for ch in s:
-                            if ch == '?':
-                                try:
-                                    out.append(_fmt_value(next(it)))
-                                except StopIteration:
-                                    out.append('?')
-                            else:
-                                out.append(ch)
-                        return ''.join(out)
-                    # Then try %s tokens
-                    def repl_s(_m, it=iter(vals)):
-                        try:
-                            return _fmt_value(next(it))
-                        except StopIteration:
-                            return '%s'
-                    s = re.sub(r"%s", repl_s, s)
-                    return s
-            except Exception:
-                return s
-            return s
+                for applied in upgrade():
+                    print(f"[INFO] Applied schema migration {applied}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"[WARN] Schema check failed; run 'flask migrate' once the database is reachable. Error: {e}")
 
-        try:
-            if hasattr(g, "_sql_log") and g._sql_log:
-                # Store only the most recent executed statement
-                stmt, params = g._sql_log[-1]
-                session["last_sql"] = _render_sql(stmt, params)
-        except Exception:
-            pass
-        return response
-
-    @app.context_processor
-    def inject_sql_log():
-        return {"sql_recent": (session.get("last_sql") or "").strip()}
+        # Per-request SQL ring buffer, query count/time and Server-Timing header
+        from .sql_log import init_sql_log
+        init_sql_log(app, db.engine)
+
+    # Session data stays server-side; the cookie only carries an opaque id
+    from .sessions import init_sessions
+    init_sessions(app)
+    from .ratelimit import init_ratelimit
+    init_ratelimit(app)
 
     # Register blueprints
     # Existing Mini Store blueprints (kept for backward compatibility)
@@ -209,11 +158,151 @@ def create_app():
     # CLI commands
     @app.cli.command("init-db")
     def init_db_cmd():
-        from .models import Product, Customer, Sale  # noqa
+        from .migrations import upgrade
         with app.app_context():
-            db.create_all()
+            upgrade()
         print("Initialized the database.")
 
+    @app.cli.command("migrate")
+    def migrate_cmd():
+        """Apply pending schema migrations."""
+        from .migrations import SCHEMA_VERSION, upgrade
+        with app.app_context():
+            applied = upgrade()
+        for line in applied:
+            print(f"Applied {line}")
+        print(f"Schema is at version {SCHEMA_VERSION}.")
+
+    @app.cli.command("bench-startup")
+    @click.option("--runs", default=5, show_default=True, help="Fresh interpreters to time.")
+    @click.option("--json", "as_json", is_flag=True, help="Print machine-readable output.")
+    def bench_startup_cmd(runs, as_json):
+        """Time package import, create_app() and the first request in fresh processes."""
+        from .bench import format_table, startup_timings
+        result = startup_timings(runs=runs)
+        if as_json:
+            import json
+            print(json.dumps(result, indent=2))
+        else:
+            print(format_table(result))
+
+    @app.cli.command("pack-transactions")
+    @click.option("--batch-size", default=500, show_default=True, help="Rows converted per commit.")
+    def pack_transactions_cmd(batch_size):
+        """Convert per-field encrypted transactions to the packed single-token format."""
+        from .migrations import pack_transactions
+        with app.app_context():
+            result = pack_transactions(batch_size=batch_size)
+        print(f"Packed {result['packed']} transactions ({result['skipped']} skipped: undecryptable).")
+
+    @app.cli.command("backfill-blind-indexes")
+    @click.option("--batch-size", default=500, show_default=True, help="Rows updated per commit.")
+    def backfill_blind_indexes_cmd(batch_size):
+        """Populate month/type/category blind indexes on existing transactions."""
+        from .migrations import backfill_blind_indexes
+        with app.app_context():
+            result = backfill_blind_indexes(batch_size=batch_size)
+        print(f"Indexed {result['updated']} transactions.")
+
+    @app.cli.command("rebuild-rollups")
+    @click.option("--company-id", type=int, default=None, help="Only rebuild this company.")
+    def rebuild_rollups_cmd(company_id):
+        """Recompute the monthly income/expense rollups from transactions."""
+        from .rollups import rebuild_rollups
+        with app.app_context():
+            count = rebuild_rollups(company_id)
+        print(f"Rebuilt rollups from {count} transactions.")
+
+    @app.cli.command("rebuild-sales-rollups")
+    def rebuild_sales_rollups_cmd():
+        """Recompute the daily store sales rollups from the sale table."""
+        from .sales_rollups import rebuild_sales_rollups
+        with app.app_context():
+            count = rebuild_sales_rollups()
+        print(f"Rebuilt {count} daily sales buckets.")
+
+    @app.cli.command("sweep-sessions")
+    def sweep_sessions_cmd():
+        """Delete expired server-side sessions."""
+        from .sessions import sweep_sessions
+        with app.app_context():
+            removed = sweep_sessions(app)
+        print(f"Removed {removed} expired sessions.")
+
+    @app.cli.command("sweep-otps")
+    @click.option("--batch-size", type=int, default=None, help="Rows deleted per commit (OTP_SWEEP_BATCH).")
+    def sweep_otps_cmd(batch_size):
+        """Delete expired and verified OTPs in batches."""
+        from .otp import sweep_otps
+        with app.app_context():
+            removed = sweep_otps(batch_size or app.config.get("OTP_SWEEP_BATCH", 500))
+        print(f"Removed {removed} OTPs.")
+
+    @app.cli.command("import-transactions")
+    @click.argument("path", type=click.File("rb"))
+    @click.option("--company-id", type=int, required=True)
+    @click.option("--format", "fmt", type=click.Choice(["csv", "ndjson"]), default=None, help="Defaults to the file extension.")
+    @click.option("--batch-size", type=int, default=None, help="Rows per insert batch (IMPORT_BATCH_SIZE).")
+    def import_transactions_cmd(path, company_id, fmt, batch_size):
+        """Bulk-import transactions for a company from a CSV or NDJSON file."""
+        from .importer import detect_format, import_transactions
+        from .models import Company
+        with app.app_context():
+            if db.session.get(Company, company_id) is None:
+                raise click.ClickException(f"No company with id {company_id}.")
+            result = import_transactions(company_id, path, fmt or detect_format(path.name), batch_size)
+        for err in result["errors"]:
+            print(f"line {err['line']}: {err['error']}")
+        if result["errors_truncated"]:
+            print("(further errors not shown)")
+        print(f"Imported {result['imported']} transactions, {result['failed']} rows failed.")
+
+    @app.cli.command("deliver-outbox")
+    @click.option("--limit", default=100, show_default=True, help="Max messages to attempt.")
+    def deliver_outbox_cmd(limit):
+        """Deliver due emails from the outbox (for deployments with OUTBOX_WORKER=0)."""
+        from .outbox import drain
+        with app.app_context():
+            attempted = drain(limit=limit)
+        print(f"Attempted delivery of {attempted} emails.")
+
+    @app.cli.command("bench-routes")
+    @click.option("--sizes", default="100,1000,5000", show_default=True, help="Comma-separated transactions per company.")
+    @click.option("--companies", default=2, show_default=True)
+    @click.option("--products", default=200, show_default=True)
+    @click.option("--sales", default=1000, show_default=True)
+    @click.option("--repeat", default=10, show_default=True, help="Timed requests per route.")
+    @click.option("--output", default="bench_routes.json", show_default=True, help="JSON report path.")
+    def bench_routes_cmd(sizes, companies, products, sales, repeat, output):
+        """Benchmark key routes against synthetic data in throwaway SQLite databases."""
+        import json
+        from .bench import format_routes_table, route_benchmarks
+        result = route_benchmarks(
+            [int(s) for s in sizes.split(",") if s.strip()],
+            companies=companies,
+            products=products,
+            sales=sales,
+            repeat=repeat,
+        )
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(format_routes_table(result))
+        print(f"Wrote {output}")
+
+    @app.cli.command("bench-otp")
+    @click.option("--iterations", default=200, show_default=True, help="Operations timed per measurement.")
+    @click.option("--json", "as_json", is_flag=True, help="Print machine-readable output.")
+    def bench_otp_cmd(iterations, as_json):
+        """Compare legacy and HMAC OTP hashing throughput on a single core."""
+        from .bench import format_otp_table, otp_benchmarks
+        with app.app_context():
+            result = otp_benchmarks(iterations=iterations)
+        if as_json:
+            import json
+            print(json.dumps(result, indent=2))
+        else:
+            print(format_otp_table(result))
+
     @app.cli.command("seed-demo")
     def seed_demo_cmd():
         from datetime import date
@@ -243,22 +332,13 @@ def create_app():
                 db.session.commit()
 
             if not Sale.query.first():
-                # Create some sample sales
+                # Create some sample sales through checkout so stock and sales rollups stay in step
+                from .checkout import checkout
                 products = Product.query.all()
                 customers = Customer.query.all()
                 if products and customers:
-                    sales = [
-                        Sale(product_id=products[0].id, customer_id=customers[0].id, quantity=1, total_price=products[0].price, sale_date=date.today()),
-                        Sale(product_id=products[1].id, customer_id=customers[1].id, quantity=2, total_price=products[1].price * 2, sale_date=date.today()),
-                        Sale(product_id=products[2].id, customer_id=customers[0].id, quantity=1, total_price=products[2].price, sale_date=date.today()),
-                    ]
-                    # Update stock for seeded sales
-                    for sale in sales:
-                        product = Product.query.get(sale.product_id)
-                        if product:
-                            product.stock_qty -= sale.quantity
-                    db.session.add_all(sales)
-                    db.session.commit()
+                    checkout([(products[0].id, 1), (products[2].id, 1)], customer_id=customers[0].id)
+                    checkout([(products[1].id, 2)], customer_id=customers[1].id)
         print("Seeded demo data.")
 
     return app
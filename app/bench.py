@@ -0,0 +1,405 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+# Benchmarks run from the CLI (`flask bench-*`). Each one returns a plain dict
+# so results can be printed as a table or written out as JSON for comparison.
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+_STARTUP_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import app as pkg
+t1 = time.perf_counter()
+flask_app = pkg.create_app()
+t2 = time.perf_counter()
+client = flask_app.test_client()
+resp = client.get("/login")
+t3 = time.perf_counter()
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000,
+    "create_app_ms": (t2 - t1) * 1000,
+    "first_request_ms": (t3 - t2) * 1000,
+    "status": resp.status_code,
+}))
+"""
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    return {
+        "median": round(statistics.median(ordered), 2),
+        "min": round(ordered[0], 2),
+        "max": round(ordered[-1], 2),
+    }
+
+
+def startup_timings(runs: int = 5) -> Dict[str, Any]:
+    """Import, create_app() and first-request latency, each measured in a fresh interpreter."""
+    samples: Dict[str, List[float]] = {"import_ms": [], "create_app_ms": [], "first_request_ms": []}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _STARTUP_SCRIPT],
+            cwd=PROJECT_ROOT,
+            env=dict(os.environ),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        data = json.loads(proc.stdout.strip().splitlines()[-1])
+        for key in samples:
+            samples[key].append(data[key])
+    return {"benchmark": "startup", "runs": runs, **{k: _summary(v) for k, v in samples.items()}}
+
+
+def format_table(result: Dict[str, Any]) -> str:
+    lines = [f"{result['benchmark']} ({result['runs']} runs)", f"{'metric':<20}{'median':>10}{'min':>10}{'max':>10}"]
+    for key, value in result.items():
+        if isinstance(value, dict) and "median" in value:
+            lines.append(f"{key:<20}{value['median']:>10}{value['min']:>10}{value['max']:>10}")
+    return "\n".join(lines)
+
+
+# Routes exercised by route_benchmarks(); store pages share the same seeded database.
+# The PDF statement renders in a background job, so it is timed separately
+# (pdf_render: submit, poll until done, download).
+BENCH_ROUTES = [
+    ("dashboard", "/"),
+    ("transactions", "/txn/"),
+    ("reports", "/reports"),
+    ("reports_filtered", "/reports?start=2023-01-01&end=2023-06-30"),
+    ("csv_export", "/reports/download"),
+    ("store_home", "/store/"),
+    ("store_reports", "/store/reports/"),
+]
+
+
+def _seed(flask_app, companies: int, txns: int, products: int, sales: int, seed: int = 7) -> List[int]:
+    """Insert synthetic encrypted transactions plus store data; returns the company ids."""
+    import random
+    from datetime import date, timedelta
+    from decimal import Decimal
+
+    from .extensions import db
+    from .models import Company, Customer, Product, Sale, Transaction
+    from .rollups import rebuild_rollups
+    from .sales_rollups import rebuild_sales_rollups
+    from .utils import encrypt_transaction_fields
+
+    rng = random.Random(seed)
+    categories = ["Rent", "Salary", "Sales", "Travel", "Food", "Utilities", "Consulting", "Supplies"]
+    start = date(2021, 1, 1)
+    company_ids = []
+    with flask_app.app_context():
+        for c in range(companies):
+            company = Company(name=f"Bench Co {c}", email=f"bench{c}@example.com", password_hash="x")
+            db.session.add(company)
+            db.session.flush()
+            company_ids.append(company.id)
+            rows = []
+            for _ in range(txns):
+                day = start + timedelta(days=rng.randrange(4 * 365))
+                t_type = "income" if rng.random() < 0.4 else "expense"
+                amount = Decimal(rng.randrange(100, 500000)) / 100
+                fields = encrypt_transaction_fields(day.isoformat(), t_type, rng.choice(categories), amount, "bench")
+                rows.append(dict(fields, company_id=company.id))
+            for i in range(0, len(rows), 1000):
+                db.session.execute(db.insert(Transaction), rows[i:i + 1000])
+            db.session.commit()
+            rebuild_rollups(company.id)
+
+        product_rows = [
+            {
+                "name": f"Product {i}",
+                "category": categories[i % len(categories)],
+                "price": Decimal(rng.randrange(100, 100000)) / 100,
+                "stock_qty": rng.randrange(0, 200),
+                "low_stock_threshold": 10,
+            }
+            for i in range(products)
+        ]
+        for row in product_rows:
+            # Bulk inserts skip the mapper event that maintains the flag
+            row["low_stock"] = row["stock_qty"] <= row["low_stock_threshold"]
+        if product_rows:
+            db.session.execute(db.insert(Product), product_rows)
+        customer_count = max(1, products // 4)
+        db.session.execute(
+            db.insert(Customer),
+            [{"name": f"Customer {i}", "phone": f"555-{i:05d}", "email": f"c{i}@example.com"} for i in range(customer_count)],
+        )
+        db.session.commit()
+        product_ids = [pid for (pid,) in db.session.query(Product.id)]
+        customer_ids = [cid for (cid,) in db.session.query(Customer.id)]
+        sale_rows = []
+        today = date.today()
+        for _ in range(sales if product_ids else 0):
+            qty = rng.randrange(1, 5)
+            sale_rows.append({
+                "product_id": rng.choice(product_ids),
+                "customer_id": rng.choice(customer_ids) if rng.random() < 0.7 else None,
+                "quantity": qty,
+                "total_price": Decimal(rng.randrange(100, 10000)) / 100 * qty,
+                "sale_date": today - timedelta(days=rng.randrange(365)),
+            })
+        for i in range(0, len(sale_rows), 1000):
+            db.session.execute(db.insert(Sale), sale_rows[i:i + 1000])
+        db.session.commit()
+        rebuild_sales_rollups()
+    return company_ids
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def _server_timing(resp) -> Dict[str, float]:
+    """Parse the db entry of the Server-Timing header set by app.sql_log."""
+    import re
+
+    header = resp.headers.get("Server-Timing", "")
+    m = re.search(r'db;dur=([\d.]+);desc="(\d+) queries"', header)
+    if not m:
+        return {"db_ms": 0.0, "queries": 0}
+    return {"db_ms": float(m.group(1)), "queries": int(m.group(2))}
+
+
+def _bench_route(client, path: str, repeat: int) -> Dict[str, Any]:
+    import time
+    import tracemalloc
+
+    # First hit is reported separately: it pays for cold caches
+    t0 = time.perf_counter()
+    resp = client.get(path)
+    resp.get_data()
+    cold_ms = (time.perf_counter() - t0) * 1000
+
+    if not 200 <= resp.status_code < 300:
+        # Error pages are not the route's performance; report and skip
+        return {"status": resp.status_code, "skipped": f"HTTP {resp.status_code}"}
+
+    latencies = []
+    cold = timing = _server_timing(resp)
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        resp = client.get(path)
+        resp.get_data()  # drain streamed bodies
+        latencies.append((time.perf_counter() - t0) * 1000)
+        timing = _server_timing(resp)
+
+    # Separate pass so tracing overhead doesn't skew latencies
+    tracemalloc.start()
+    client.get(path).get_data()
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ordered = sorted(latencies)
+    return {
+        "status": resp.status_code,
+        "cold_ms": round(cold_ms, 2),
+        "p50_ms": round(_percentile(ordered, 0.50), 2),
+        "p95_ms": round(_percentile(ordered, 0.95), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        "cold_queries": cold["queries"],
+        "queries": timing["queries"],
+        "db_ms": timing["db_ms"],
+        "peak_kib": round(peak / 1024, 1),
+        "bytes": len(resp.get_data()),
+    }
+
+
+def _render_pdf_job(client, run: int, timeout: float = 120.0) -> Dict[str, Any]:
+    import time
+    from datetime import date, timedelta
+
+    # A distinct (far-future) end date per run gives each run its own job, so nothing is served from cache
+    end = (date(2999, 1, 1) + timedelta(days=run)).isoformat()
+    t0 = time.perf_counter()
+    resp = client.post("/reports/pdf-jobs", data={"end": end})
+    if resp.status_code != 202:
+        return {"status": resp.status_code}
+    job = resp.get_json()
+    deadline = time.monotonic() + timeout
+    while job["status"] not in ("done", "failed") and time.monotonic() < deadline:
+        time.sleep(0.005)
+        job = client.get(job["status_url"]).get_json()
+    if job["status"] != "done":
+        return {"status": 500 if job["status"] == "failed" else 504}
+    resp = client.get(job["download_url"])
+    size = len(resp.get_data())
+    return {"status": resp.status_code, "ms": (time.perf_counter() - t0) * 1000, "bytes": size}
+
+
+def _bench_pdf(client, repeat: int) -> Dict[str, Any]:
+    """End-to-end statement PDF latency: submit, wait for the background render, download."""
+    import tracemalloc
+
+    cold = _render_pdf_job(client, 0)
+    if cold["status"] != 200:
+        return {"status": cold["status"], "skipped": f"HTTP {cold['status']}"}
+    runs = [_render_pdf_job(client, i) for i in range(1, repeat + 1)]
+    failed = [r["status"] for r in runs if r["status"] != 200]
+    if failed:
+        return {"status": failed[0], "skipped": f"HTTP {failed[0]}"}
+
+    tracemalloc.start()
+    _render_pdf_job(client, repeat + 1)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    ordered = sorted(r["ms"] for r in runs)
+    return {
+        "status": 200,
+        "cold_ms": round(cold["ms"], 2),
+        "p50_ms": round(_percentile(ordered, 0.50), 2),
+        "p95_ms": round(_percentile(ordered, 0.95), 2),
+        "max_ms": round(ordered[-1], 2) if ordered else 0.0,
+        # Rendering queries run in the job thread, outside any request's Server-Timing
+        "cold_queries": "-",
+        "queries": "-",
+        "db_ms": "-",
+        "peak_kib": round(peak / 1024, 1),
+        "bytes": cold["bytes"],
+    }
+
+
+def route_benchmarks(
+    sizes: List[int],
+    companies: int = 2,
+    products: int = 200,
+    sales: int = 1000,
+    repeat: int = 10,
+) -> Dict[str, Any]:
+    """Per-route latency, query count and peak memory at each transactions-per-company size.
+
+    Every size gets a fresh SQLite database in a temporary directory, so the
+    benchmark never touches the configured database and needs no network.
+    """
+    import tempfile
+    import time
+
+    from cryptography.fernet import Fernet
+
+    from . import create_app
+
+    overrides = {
+        "DATABASE_URL": "",
+        "DB_DIALECT": "sqlite",
+        "OUTBOX_WORKER": "0",
+        # Time rendering, not replays of cached bodies; create_app() starts the other caches cold
+        "RESPONSE_CACHE_SIZE": "0",
+        "ENCRYPTION_KEY": os.environ.get("ENCRYPTION_KEY") or Fernet.generate_key().decode(),
+    }
+    saved = {k: os.environ.get(k) for k in list(overrides) + ["SQLITE_PATH", "INSTANCE_PATH"]}
+    results = []
+    try:
+        os.environ.update(overrides)
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as tmp:
+                os.environ["SQLITE_PATH"] = os.path.join(tmp, "bench.sqlite3")
+                # PDF job output, file sessions etc. stay in the throwaway directory
+                os.environ["INSTANCE_PATH"] = os.path.join(tmp, "instance")
+                flask_app = create_app()
+                t0 = time.perf_counter()
+                company_ids = _seed(flask_app, companies, size, products, sales)
+                seed_s = time.perf_counter() - t0
+                client = flask_app.test_client()
+                with client.session_transaction() as sess:
+                    sess["company_id"] = company_ids[0]
+                    sess["otp_verified"] = True
+                routes = {name: _bench_route(client, path, repeat) for name, path in BENCH_ROUTES}
+                routes["pdf_render"] = _bench_pdf(client, repeat)
+                skipped = {name: r["skipped"] for name, r in routes.items() if "skipped" in r}
+                if skipped:
+                    print(f"[WARN] txns/company={size}: skipped {', '.join(f'{n} ({why})' for n, why in skipped.items())}")
+                with flask_app.app_context():
+                    from .extensions import db
+                    db.engine.dispose()
+                results.append({"txns_per_company": size, "seed_seconds": round(seed_s, 2), "routes": routes})
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    return {
+        "benchmark": "routes",
+        "python": sys.version.split()[0],
+        "companies": companies,
+        "products": products,
+        "sales": sales,
+        "repeat": repeat,
+        "results": results,
+    }
+
+
+def format_routes_table(result: Dict[str, Any]) -> str:
+    cols = ("status", "cold_ms", "p50_ms", "p95_ms", "cold_queries", "queries", "db_ms", "peak_kib")
+    lines = []
+    for entry in result["results"]:
+        lines.append(f"txns/company={entry['txns_per_company']} (seeded in {entry['seed_seconds']}s)")
+        lines.append(f"{'route':<18}" + "".join(f"{c:>13}" for c in cols))
+        for name, stats in entry["routes"].items():
+            if "skipped" in stats:
+                lines.append(f"{name:<18}{stats['status']:>13}  skipped ({stats['skipped']})")
+                continue
+            lines.append(f"{name:<18}" + "".join(f"{stats[c]:>13}" for c in cols))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _ops_per_sec(fn, iterations: int) -> float:
+    import time
+
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    elapsed = time.perf_counter() - t0
+    return round(iterations / elapsed, 1) if elapsed else 0.0
+
+
+def otp_benchmarks(iterations: int = 200) -> Dict[str, Any]:
+    """Issue/verify throughput of the legacy Werkzeug OTP hash vs the HMAC scheme, on one core.
+
+    "login" is the CPU work of a full sign-in: password check, OTP issue and
+    OTP verify. Needs an app context (for the HMAC key).
+    """
+    from werkzeug.security import check_password_hash, generate_password_hash
+
+    from .utils import generate_otp, hash_otp, verify_otp_hash, verify_password
+
+    code = generate_otp()
+    password_hash = generate_password_hash("bench-password")
+    schemes = {"legacy": generate_password_hash, "hmac": hash_otp}
+    results: Dict[str, Dict[str, float]] = {}
+    for name, issue in schemes.items():
+        stored = issue(code)
+        verify = verify_otp_hash if name == "hmac" else check_password_hash
+
+        def login(issue=issue, verify=verify):
+            verify_password(password_hash, "bench-password")
+            verify(issue(code), code)
+
+        results[name] = {
+            "issue_ops": _ops_per_sec(lambda: issue(code), iterations),
+            "verify_ops": _ops_per_sec(lambda: verify(stored, code), iterations),
+            "login_ops": _ops_per_sec(login, max(1, iterations // 4)),
+        }
+    return {"benchmark": "otp", "python": sys.version.split()[0], "iterations": iterations, "results": results}
+
+
+def format_otp_table(result: Dict[str, Any]) -> str:
+    cols = ("issue_ops", "verify_ops", "login_ops")
+    lines = [f"{result['benchmark']} ({result['iterations']} iterations, ops/sec)", f"{'scheme':<10}" + "".join(f"{c:>12}" for c in cols)]
+    for name, stats in result["results"].items():
+        lines.append(f"{name:<10}" + "".join(f"{stats[c]:>12}" for c in cols))
+    return "\n".join(lines)
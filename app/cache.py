@@ -0,0 +1,204 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+from flask import current_app
+
+from .utils import decrypt_transaction, decrypt_transactions
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping with hit/miss counters.
+
+    With ``ttl`` (seconds), entries also expire that long after being set.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = max(0, int(maxsize))
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if self.ttl is not None:
+                expires, value = value
+                if expires <= time.monotonic():
+                    del self._data[key]
+                    self.misses += 1
+                    return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize == 0:
+            return
+        if self.ttl is not None:
+            value = (time.monotonic() + self.ttl, value)
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._data.pop(key, None)
+        if self.ttl is not None and value is not None:
+            return value[1]
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+# Decrypted Transaction rows, shared by dashboard, transaction list and reports.
+# Keys include a digest of the row's ciphertext, so a row rewritten elsewhere
+# (another worker, a migration) simply misses instead of being served stale.
+_txn_cache: Optional[LRUCache] = None
+_txn_cache_lock = threading.Lock()
+
+
+def _get_txn_cache() -> LRUCache:
+    global _txn_cache
+    if _txn_cache is None:
+        with _txn_cache_lock:
+            if _txn_cache is None:
+                _txn_cache = LRUCache(current_app.config.get("TXN_CACHE_SIZE", 50000))
+    return _txn_cache
+
+
+def ciphertext_digest(t) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for value in (t.record_enc, t.date_enc, t.type_enc, t.category_enc, t.amount_enc, t.notes_enc):
+        value = value or b""
+        h.update(len(value).to_bytes(4, "big"))
+        h.update(value)
+    return h.digest()
+
+
+def _txn_key(t) -> Tuple[int, int, bytes]:
+    return (t.company_id, t.id, ciphertext_digest(t))
+
+
+def cached_transaction_row(t) -> Dict[str, Any]:
+    """Return the decrypted row for a Transaction, decrypting only on a miss.
+
+    The returned dict is shared between requests and must not be mutated.
+    """
+    cache = _get_txn_cache()
+    key = _txn_key(t)
+    row = cache.get(key)
+    if row is None:
+        row = decrypt_transaction(t)
+        cache.set(key, row)
+    return row
+
+
+def cached_transaction_rows(txns: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Batch form of ``cached_transaction_row``: misses are decrypted together via ``decrypt_many``."""
+    cache = _get_txn_cache()
+    keys = [_txn_key(t) for t in txns]
+    rows: List[Optional[Dict[str, Any]]] = [cache.get(k) for k in keys]
+    missing = [i for i, row in enumerate(rows) if row is None]
+    if missing:
+        for i, row in zip(missing, decrypt_transactions([txns[i] for i in missing])):
+            cache.set(keys[i], row)
+            rows[i] = row
+    return rows  # type: ignore[return-value]
+
+
+def invalidate_transaction(t) -> None:
+    """Drop the cached row for ``t``; call before its ciphertext changes."""
+    if t.id is None:
+        return
+    _get_txn_cache().pop(_txn_key(t))
+
+
+def txn_cache_stats() -> Dict[str, int]:
+    return _get_txn_cache().stats()
+
+
+# Store (/store/) caches: dashboard metrics plus any registered by other
+# modules (typeahead search). Entries expire after their TTL so writes made by
+# other workers show up within that window; writes in this process clear them
+# as soon as they commit (see the session hooks in app.versions).
+_store_cache: Optional[LRUCache] = None
+_store_caches: List[LRUCache] = []
+_reset_hooks: List[Callable[[], None]] = []
+
+
+def register_store_cache(cache: LRUCache) -> LRUCache:
+    """Have ``cache`` cleared whenever store data changes."""
+    with _txn_cache_lock:
+        _store_caches.append(cache)
+    return cache
+
+
+def _get_store_cache() -> LRUCache:
+    global _store_cache
+    if _store_cache is None:
+        _store_cache = register_store_cache(LRUCache(16, ttl=current_app.config.get("STORE_METRICS_TTL", 30)))
+    return _store_cache
+
+
+def cached_store_metrics(key: Hashable, compute) -> Dict[str, Any]:
+    cache = _get_store_cache()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value)
+    return value
+
+
+def invalidate_store_caches() -> None:
+    for cache in list(_store_caches):
+        cache.clear()
+
+
+def on_reset(hook: Callable[[], None]) -> Callable[[], None]:
+    """Run ``hook`` from reset_caches(), e.g. to drop a module's lazily created cache."""
+    with _txn_cache_lock:
+        _reset_hooks.append(hook)
+    return hook
+
+
+def reset_caches() -> None:
+    """Drop every in-process cache; create_app() calls this so a new app never sees another database's data.
+
+    Caches are rebuilt lazily with the new app's config.
+    """
+    global _txn_cache, _store_cache
+    with _txn_cache_lock:
+        _txn_cache = None
+        _store_cache = None
+        _store_caches.clear()
+        hooks = list(_reset_hooks)
+    for hook in hooks:
+        hook()
@@ -0,0 +1,94 @@
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .extensions import db
+from .models import Customer, Product, Sale
+from .sales_rollups import apply_sales
+
+# Store checkout. Stock is decremented with one conditional UPDATE per product
+# (`... WHERE stock_qty >= :q`), so two concurrent checkouts can never oversell:
+# the second one simply matches no row. All updates and Sale inserts share one
+# transaction, along with the daily sales rollups, and are rolled back together
+# when any line is short.
+
+
+class CheckoutError(Exception):
+    """Invalid basket (unknown product/customer, bad quantity)."""
+
+
+class InsufficientStock(CheckoutError):
+    def __init__(self, product_id: int, requested: int, available: int):
+        super().__init__(f"Insufficient stock for product {product_id}. Available: {available}")
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+
+
+def _merge_lines(lines: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: Dict[int, int] = {}
+    for product_id, quantity in lines:
+        if quantity <= 0:
+            raise CheckoutError("Quantity must be greater than 0.")
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    if not merged:
+        raise CheckoutError("No items in basket.")
+    # Fixed lock order so concurrent baskets can't deadlock on server databases
+    return sorted(merged.items())
+
+
+def checkout(
+    lines: Iterable[Tuple[int, int]],
+    customer_id: Optional[int] = None,
+    sale_date: Optional[date] = None,
+) -> List[Dict[str, Any]]:
+    """Record a sale per (product_id, quantity) line and commit; returns the recorded lines.
+
+    Raises CheckoutError / InsufficientStock after rolling back.
+    """
+    sale_date = sale_date or date.today()
+    try:
+        items = _merge_lines(lines)
+        if customer_id is not None and db.session.get(Customer, customer_id) is None:
+            raise CheckoutError(f"Unknown customer {customer_id}.")
+        for product_id, quantity in items:
+            result = db.session.execute(
+                db.update(Product)
+                .where(Product.id == product_id, Product.stock_qty >= quantity)
+                # low_stock first: MySQL applies SET clauses left to right
+                .ordered_values(
+                    (Product.low_stock, Product.stock_qty - quantity <= Product.low_stock_threshold),
+                    (Product.stock_qty, Product.stock_qty - quantity),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                available = db.session.execute(
+                    db.select(Product.stock_qty).where(Product.id == product_id)
+                ).scalar()
+                if available is None:
+                    raise CheckoutError(f"Unknown product {product_id}.")
+                raise InsufficientStock(product_id, quantity, available)
+        # Read prices after the UPDATEs so the rows are already locked
+        prices = dict(
+            db.session.execute(
+                db.select(Product.id, Product.price).where(Product.id.in_([pid for pid, _ in items]))
+            ).all()
+        )
+        rows = [
+            {
+                "product_id": product_id,
+                "customer_id": customer_id,
+                "quantity": quantity,
+                "total_price": Decimal(str(prices[product_id])) * quantity,
+                "sale_date": sale_date,
+            }
+            for product_id, quantity in items
+        ]
+        db.session.execute(db.insert(Sale), rows)
+        apply_sales(rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return rows
@@ -8,6 +8,20 @@ class Config:
     def __init__(self):
         # Base defaults; DB URI finalized in create_app to use app.instance_path
         self.SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
+        # Session storage: "db" (server_session table), "file" (SESSION_FILE_DIR) or "cookie" (signed cookie)
+        self.SESSION_BACKEND = os.getenv("SESSION_BACKEND", "db")
+        self.SESSION_FILE_DIR = os.getenv("SESSION_FILE_DIR", "")
+        # Seconds between opportunistic sweeps of expired server-side sessions (0 disables)
+        self.SESSION_SWEEP_INTERVAL = int(os.getenv("SESSION_SWEEP_INTERVAL", "3600"))
+        # Auth throttling: "<burst>/<seconds>" token buckets per client IP and per account ("0" disables one),
+        # kept in process memory ("memory") or a SQLite file shared by workers ("sqlite")
+        self.RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1") != "0"
+        self.RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "memory")
+        self.RATELIMIT_SQLITE_PATH = os.getenv("RATELIMIT_SQLITE_PATH", "")
+        self.RATELIMIT_IP = os.getenv("RATELIMIT_IP", "20/60")
+        self.RATELIMIT_ACCOUNT = os.getenv("RATELIMIT_ACCOUNT", "5/60")
+        # Reverse proxies in front of the app that append X-Forwarded-For (0 = connect directly); sets request.remote_addr
+        self.TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", "0"))
         self.SQLALCHEMY_TRACK_MODIFICATIONS = False
         # Encryption key for Fernet (urlsafe base64 32 bytes). Generate and set via env in production.
         self.ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "")
@@ -16,5 +30,55 @@ class Config:
         self.EMAILJS_TEMPLATE_ID = os.getenv("EMAILJS_TEMPLATE_ID", "template_3k0qsip")
         self.EMAILJS_PUBLIC_KEY = os.getenv("EMAILJS_PUBLIC_KEY", "s-y6ER6Y_clINy-Ws")
         self.EMAILJS_ACCESS_TOKEN = os.getenv("EMAILJS_ACCESS_TOKEN", "MNnxlKhQIyVk2Y7p0y0MN")
+        self.EMAILJS_API_URL = os.getenv("EMAILJS_API_URL", "https://api.emailjs.com/api/v1.0/email/send")
+        self.EMAILJS_TIMEOUT = float(os.getenv("EMAILJS_TIMEOUT", "20"))
+        # Email outbox: run the in-process delivery thread, poll interval (s), attempts, first retry delay (s)
+        self.OUTBOX_WORKER = os.getenv("OUTBOX_WORKER", "1") != "0"
+        self.OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+        self.OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+        self.OUTBOX_RETRY_BASE_SECONDS = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "5"))
         # OTP expiry window in minutes
         self.OTP_EXPIRY_MINUTES = int(os.getenv("OTP_EXPIRY_MINUTES", "10"))
+        # Wrong codes allowed per OTP, and the HMAC key for OTP hashes (derived from ENCRYPTION_KEY when unset)
+        self.OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", "5"))
+        self.OTP_HMAC_KEY = os.getenv("OTP_HMAC_KEY", "")
+        # Seconds between opportunistic sweeps of expired/verified OTPs (0 disables), and rows deleted per batch
+        self.OTP_SWEEP_INTERVAL = int(os.getenv("OTP_SWEEP_INTERVAL", "3600"))
+        self.OTP_SWEEP_BATCH = int(os.getenv("OTP_SWEEP_BATCH", "500"))
+        # Max decrypted Transaction rows kept in the in-process LRU cache
+        self.TXN_CACHE_SIZE = int(os.getenv("TXN_CACHE_SIZE", "50000"))
+        # Seconds the /store/ dashboard metrics are cached (cleared on local product/sale/customer writes)
+        self.STORE_METRICS_TTL = int(os.getenv("STORE_METRICS_TTL", "30"))
+        # Store typeahead: default/max results per lookup and cached lookups kept
+        self.SEARCH_RESULTS = int(os.getenv("SEARCH_RESULTS", "20"))
+        self.SEARCH_MAX_RESULTS = int(os.getenv("SEARCH_MAX_RESULTS", "50"))
+        self.SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "2048"))
+        # Rendered report/dashboard bodies reused while the data version is unchanged
+        self.RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+        self.RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+        # Write new/edited transactions as a single packed token instead of five per-field tokens
+        self.TXN_PACKED_RECORDS = os.getenv("TXN_PACKED_RECORDS", "1") != "0"
+        # HMAC key for transaction blind indexes; derived from ENCRYPTION_KEY when unset
+        self.BLIND_INDEX_KEY = os.getenv("BLIND_INDEX_KEY", "")
+        # Bulk decryption: worker count (default: CPU count) and batch sizes that switch to
+        # a thread pool / process pool (0 disables the process pool)
+        self.DECRYPT_WORKERS = int(os.getenv("DECRYPT_WORKERS", "0")) or None
+        self.DECRYPT_PARALLEL_MIN = int(os.getenv("DECRYPT_PARALLEL_MIN", "512"))
+        self.DECRYPT_PROCESS_MIN = int(os.getenv("DECRYPT_PROCESS_MIN", "0"))
+        # Statement CSV export: rows decrypted per streamed chunk, and gzip when the client accepts it
+        self.CSV_STREAM_BATCH = int(os.getenv("CSV_STREAM_BATCH", "500"))
+        self.CSV_GZIP = os.getenv("CSV_GZIP", "1") != "0"
+        # Bulk transaction import: rows per encrypt/insert/commit batch, and per-row errors reported
+        self.IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+        self.IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))
+        # Background PDF statement jobs: render threads, cached output lifetime (s), stuck-job timeout (s),
+        # and how long (s) a failed job is reported before the next request renders it again
+        self.PDF_JOB_WORKERS = int(os.getenv("PDF_JOB_WORKERS", "2"))
+        self.PDF_CACHE_TTL = int(os.getenv("PDF_CACHE_TTL", "3600"))
+        self.PDF_JOB_TIMEOUT = int(os.getenv("PDF_JOB_TIMEOUT", "600"))
+        self.PDF_FAILED_RETRY_SECONDS = int(os.getenv("PDF_FAILED_RETRY_SECONDS", "30"))
+        # SQL panel: statements kept per request (0 disables capture; count/timing stay on)
+        self.SQL_LOG_SIZE = 0 if os.getenv("DISABLE_SQL_LOG", "0") == "1" else int(os.getenv("SQL_LOG_SIZE", "50"))
+        self.SQL_SERVER_TIMING = os.getenv("SQL_SERVER_TIMING", "1") != "0"
+        # Apply pending schema migrations at startup (otherwise run `flask migrate`)
+        self.AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") != "0"
@@ -0,0 +1,133 @@
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+
+# Named engine profiles. Each can be tweaked per setting via the env vars in
+# _ENV_OVERRIDES; pool settings apply to server databases (MySQL), pragmas to
+# SQLite, where they are issued on every new connection.
+PROFILES: Dict[str, Dict[str, Any]] = {
+    # SQLAlchemy/SQLite library defaults (rollback journal, no pool tuning)
+    "legacy": {},
+    # Balanced settings for a few gunicorn workers
+    "default": {
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "NORMAL",
+        "sqlite_cache_size": -16000,  # negative = KiB
+        "sqlite_mmap_size": 64 * 1024 * 1024,
+        "sqlite_busy_timeout": 5000,
+    },
+    # Many workers/threads sharing one database
+    "high-concurrency": {
+        "pool_size": 20,
+        "max_overflow": 40,
+        "pool_recycle": 900,
+        "pool_pre_ping": True,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "NORMAL",
+        "sqlite_cache_size": -64000,
+        "sqlite_mmap_size": 256 * 1024 * 1024,
+        "sqlite_busy_timeout": 15000,
+    },
+    # Small containers
+    "low-memory": {
+        "pool_size": 2,
+        "max_overflow": 2,
+        "pool_recycle": 1800,
+        "pool_pre_ping": True,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "NORMAL",
+        "sqlite_cache_size": -2000,
+        "sqlite_mmap_size": 0,
+        "sqlite_busy_timeout": 5000,
+    },
+}
+
+DEFAULT_PROFILE = "default"
+
+_ENV_OVERRIDES = {
+    "pool_size": ("DB_POOL_SIZE", int),
+    "max_overflow": ("DB_MAX_OVERFLOW", int),
+    "pool_recycle": ("DB_POOL_RECYCLE", int),
+    "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v.lower() in ("1", "true", "yes")),
+    "sqlite_journal_mode": ("SQLITE_JOURNAL_MODE", str.upper),
+    "sqlite_synchronous": ("SQLITE_SYNCHRONOUS", str.upper),
+    "sqlite_cache_size": ("SQLITE_CACHE_SIZE", int),
+    "sqlite_mmap_size": ("SQLITE_MMAP_SIZE", int),
+    "sqlite_busy_timeout": ("SQLITE_BUSY_TIMEOUT_MS", int),
+}
+
+_ALLOWED_PRAGMA_VALUES = {
+    "sqlite_journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "sqlite_synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+}
+
+
+def resolve_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """Settings for the DB_PROFILE (or ``name``) profile with env overrides applied."""
+    name = (name or os.getenv("DB_PROFILE") or DEFAULT_PROFILE).lower()
+    if name not in PROFILES:
+        print(f"[WARN] Unknown DB_PROFILE '{name}'; using '{DEFAULT_PROFILE}'.")
+        name = DEFAULT_PROFILE
+    settings = dict(PROFILES[name])
+    for key, (env, cast) in _ENV_OVERRIDES.items():
+        raw = os.getenv(env)
+        if raw in (None, ""):
+            continue
+        try:
+            value = cast(raw)
+        except ValueError:
+            print(f"[WARN] Ignoring invalid {env}={raw!r}.")
+            continue
+        if key in _ALLOWED_PRAGMA_VALUES and value not in _ALLOWED_PRAGMA_VALUES[key]:
+            print(f"[WARN] Ignoring invalid {env}={raw!r}.")
+            continue
+        settings[key] = value
+    settings["name"] = name
+    return settings
+
+
+def engine_options(uri: str, settings: Dict[str, Any]) -> Dict[str, Any]:
+    """SQLALCHEMY_ENGINE_OPTIONS for the given database URI."""
+    options: Dict[str, Any] = {}
+    if uri.startswith("sqlite"):
+        if "sqlite_busy_timeout" in settings:
+            # sqlite3's own lock wait, in seconds; the busy_timeout pragma mirrors it
+            options["connect_args"] = {"timeout": settings["sqlite_busy_timeout"] / 1000}
+        return options
+    for key in ("pool_size", "max_overflow", "pool_recycle", "pool_pre_ping"):
+        if key in settings:
+            options[key] = settings[key]
+    return options
+
+
+def install_sqlite_pragmas(engine, settings: Dict[str, Any]) -> None:
+    """Issue the profile's PRAGMAs on every new SQLite connection."""
+    if engine.dialect.name != "sqlite":
+        return
+    pragmas = []
+    if "sqlite_journal_mode" in settings:
+        pragmas.append(f"PRAGMA journal_mode={settings['sqlite_journal_mode']}")
+    if "sqlite_synchronous" in settings:
+        pragmas.append(f"PRAGMA synchronous={settings['sqlite_synchronous']}")
+    if "sqlite_cache_size" in settings:
+        pragmas.append(f"PRAGMA cache_size={int(settings['sqlite_cache_size'])}")
+    if "sqlite_mmap_size" in settings:
+        pragmas.append(f"PRAGMA mmap_size={int(settings['sqlite_mmap_size'])}")
+    if "sqlite_busy_timeout" in settings:
+        pragmas.append(f"PRAGMA busy_timeout={int(settings['sqlite_busy_timeout'])}")
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _record):  # noqa: ANN001
+        cursor = dbapi_conn.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+from flask import current_app
+
+from .extensions import db
+from .models import Transaction
+from .rollups import apply_transactions
+from .utils import encrypt_transaction_rows
+
+# Bulk transaction import. Input is read a line at a time; each batch of valid
+# rows is encrypted together and inserted with one executemany-style INSERT in
+# its own commit, so a bad row only costs that row and a failure late in a
+# large file leaves earlier batches in place.
+
+FORMATS = ("csv", "ndjson")
+TYPES = ("income", "expense")
+
+
+def detect_format(filename: Optional[str], default: str = "csv") -> str:
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def _iter_raw(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Any]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "ndjson":
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError:
+                yield line_no, ValueError("invalid JSON")
+        return
+    reader = csv.DictReader(text)
+    if reader.fieldnames:
+        reader.fieldnames = [(name or "").strip().lower() for name in reader.fieldnames]
+    for record in reader:
+        yield reader.line_num, record
+
+
+def validate_row(raw: Any) -> Dict[str, Any]:
+    """Normalized row or ValueError with a message suitable for the error report."""
+    if isinstance(raw, ValueError):
+        raise raw
+    if not isinstance(raw, dict):
+        raise ValueError("expected an object")
+    date_str = str(raw.get("date") or "").strip()
+    t_type = str(raw.get("type") or "").strip().lower()
+    category = str(raw.get("category") or "").strip()
+    amount_str = str(raw.get("amount") if raw.get("amount") is not None else "").strip()
+    notes = raw.get("notes")
+    if not date_str or not t_type or not category or not amount_str:
+        raise ValueError("date, type, category and amount are required")
+    try:
+        date_str = date.fromisoformat(date_str[:10]).isoformat()
+    except ValueError:
+        raise ValueError(f"invalid date {date_str!r}") from None
+    if t_type not in TYPES:
+        raise ValueError(f"type must be income or expense, got {t_type!r}")
+    try:
+        amount = Decimal(amount_str)
+    except InvalidOperation:
+        raise ValueError(f"invalid amount {amount_str!r}") from None
+    if not amount.is_finite():
+        raise ValueError(f"invalid amount {amount_str!r}")
+    return {
+        "date": date_str,
+        "type": t_type,
+        "category": category,
+        "amount": amount,
+        "notes": str(notes).strip() if notes is not None else "",
+    }
+
+
+def _flush(company_id: int, rows: List[Dict[str, Any]]) -> None:
+    columns = encrypt_transaction_rows(rows)
+    db.session.execute(db.insert(Transaction), [dict(c, company_id=company_id) for c in columns])
+    apply_transactions(company_id, rows)
+    db.session.commit()
+
+
+def import_transactions(
+    company_id: int,
+    stream: IO[bytes],
+    fmt: str = "csv",
+    batch_size: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Import CSV (header row: date,type,category,amount[,notes]) or NDJSON transactions.
+
+    Returns counts plus up to IMPORT_MAX_ERRORS ``{"line", "error"}`` entries.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    batch_size = batch_size or current_app.config.get("IMPORT_BATCH_SIZE", 1000)
+    max_errors = current_app.config.get("IMPORT_MAX_ERRORS", 100)
+    imported = 0
+    failed = 0
+    errors: List[Dict[str, Any]] = []
+    dropped = 0
+    batch: List[Dict[str, Any]] = []
+    lines: List[int] = []
+
+    def report(line: Optional[int], message: str) -> None:
+        nonlocal dropped
+        if len(errors) < max_errors:
+            errors.append({"line": line, "error": message})
+        else:
+            dropped += 1
+
+    def flush() -> None:
+        nonlocal imported, failed
+        if not batch:
+            return
+        try:
+            _flush(company_id, batch)
+            imported += len(batch)
+        except Exception as e:  # noqa: BLE001 - reported per batch, import continues
+            db.session.rollback()
+            failed += len(batch)
+            report(lines[0], f"batch of {len(batch)} rows starting here not saved: {e}")
+        batch.clear()
+        lines.clear()
+
+    try:
+        for line_no, raw in _iter_raw(stream, fmt):
+            try:
+                batch.append(validate_row(raw))
+                lines.append(line_no)
+            except ValueError as e:
+                failed += 1
+                report(line_no, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+    except (UnicodeDecodeError, csv.Error) as e:
+        report(None, f"could not read file: {e}")
+    flush()
+    return {"imported": imported, "failed": failed, "errors": errors, "errors_truncated": dropped > 0}
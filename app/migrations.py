@@ -0,0 +1,205 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateColumn
+
+from .extensions import db
+
+
+def ensure_columns() -> List[str]:
+    """Add columns and indexes declared on models but missing from existing tables.
+
+    ``db.create_all()`` only creates whole tables, so databases created before a
+    column was introduced need it added in place. Only columns that are nullable
+    or carry a server default can be added this way.
+    """
+    engine = db.engine
+    insp = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    applied = []
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not insp.has_table(table.name):
+                continue
+            existing = {c["name"] for c in insp.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {ddl}"))
+                applied.append(f"{table.name}.{column.name}")
+            existing_indexes = {i["name"] for i in insp.get_indexes(table.name)}
+            for index in table.indexes:
+                # Honour Index.ddl_if() so dialect-specific indexes match create_all()
+                condition = getattr(index, "_ddl_if", None)
+                if condition is not None and not condition._should_execute(None, index, conn):
+                    continue
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    applied.append(f"index {index.name}")
+    return applied
+
+
+def _sync_tables() -> None:
+    # Create missing tables, then add columns/indexes missing from existing ones
+    db.create_all()
+    ensure_columns()
+
+
+def _sales_rollups() -> None:
+    from .sales_rollups import rebuild_sales_rollups
+
+    _sync_tables()
+    rebuild_sales_rollups()
+
+
+def _low_stock_flag() -> None:
+    from .models import Product
+
+    _sync_tables()
+    db.session.execute(
+        db.update(Product).values(low_stock=Product.stock_qty <= Product.low_stock_threshold)
+    )
+    db.session.commit()
+
+
+def _otp_retention() -> None:
+    from .models import OTP
+    from .otp import sweep_otps
+
+    _sync_tables()
+    # The compound (company_id, verified, created_at) index replaces the single-column one
+    if "ix_otp_company_id" in {ix["name"] for ix in inspect(db.engine).get_indexes(OTP.__tablename__)}:
+        on_table = f" ON {OTP.__tablename__}" if db.engine.dialect.name == "mysql" else ""
+        with db.engine.begin() as conn:
+            conn.execute(text(f"DROP INDEX ix_otp_company_id{on_table}"))
+    sweep_otps()
+
+
+def _rebuild_transaction_rollups() -> None:
+    from .rollups import rebuild_rollups
+
+    # Earlier versions only rebuilt a company with no buckets at all, so a
+    # write after upgrading left its pre-rollup transactions out of the totals
+    rebuild_rollups()
+
+
+# Ordered schema migrations; append new entries rather than editing old ones.
+# Version 1 brings any earlier database (created by per-boot create_all) up to date.
+MIGRATIONS: List[Tuple[int, str, Callable[[], None]]] = [
+    (1, "baseline tables, packed records, blind indexes, rollups, outbox", _sync_tables),
+    (2, "sale indexes and daily sales rollups", _sales_rollups),
+    (3, "product and customer typeahead indexes", _sync_tables),
+    (4, "indexed product low-stock flag", _low_stock_flag),
+    (5, "data version counters", _sync_tables),
+    (6, "server-side sessions", _sync_tables),
+    (7, "OTP attempt counter", _sync_tables),
+    (8, "OTP lookup index and retention sweep", _otp_retention),
+    (9, "rebuild transaction rollups", _rebuild_transaction_rollups),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version() -> Optional[int]:
+    """Version recorded in schema_version, or None when the table does not exist yet."""
+    try:
+        with db.engine.connect() as conn:
+            return conn.execute(text("SELECT version FROM schema_version WHERE id = 1")).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def upgrade() -> List[str]:
+    """Apply pending migrations; returns their descriptions (empty when up to date)."""
+    from .models import SchemaVersion
+
+    version = current_version()
+    if version is not None and version >= SCHEMA_VERSION:
+        return []
+    if version is None:
+        SchemaVersion.__table__.create(db.engine, checkfirst=True)
+        version = 0
+    applied = []
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        migrate()
+        row = db.session.get(SchemaVersion, 1) or SchemaVersion(id=1)
+        row.version = number
+        row.applied_at = datetime.utcnow()
+        db.session.add(row)
+        db.session.commit()
+        applied.append(f"{number}: {description}")
+    return applied
+
+
+def pack_transactions(batch_size: int = 500) -> dict:
+    """Rewrite per-field Transaction rows into the packed single-token format.
+
+    Rows are streamed in id order, ``batch_size`` at a time, with one commit per
+    batch so the migration can be interrupted and resumed. Rows whose tokens do
+    not decrypt with the current key are left untouched and counted as skipped.
+    """
+    from .models import Transaction
+    from .utils import decrypt_text, encrypt_transaction_fields
+
+    last_id = 0
+    packed = skipped = 0
+    while True:
+        batch = (
+            Transaction.query.filter(Transaction.record_enc.is_(None), Transaction.id > last_id)
+            .order_by(Transaction.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for t in batch:
+            date_str = decrypt_text(t.date_enc)
+            t_type = decrypt_text(t.type_enc)
+            category = decrypt_text(t.category_enc)
+            amount = decrypt_text(t.amount_enc)
+            if date_str is None or t_type is None or category is None or amount is None:
+                skipped += 1
+                continue
+            columns = encrypt_transaction_fields(
+                date_str, t_type.lower(), category, Decimal(amount), decrypt_text(t.notes_enc), packed=True
+            )
+            for column, value in columns.items():
+                setattr(t, column, value)
+            packed += 1
+        last_id = batch[-1].id
+        db.session.commit()
+        db.session.expunge_all()
+    return {"packed": packed, "skipped": skipped}
+
+
+def backfill_blind_indexes(batch_size: int = 500) -> dict:
+    """Populate blind index columns on rows written before they existed."""
+    from .models import Transaction
+    from .utils import decrypt_transactions, transaction_blind_indexes
+
+    last_id = 0
+    updated = 0
+    while True:
+        batch = (
+            Transaction.query.filter(Transaction.month_bidx.is_(None), Transaction.id > last_id)
+            .order_by(Transaction.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for t, row in zip(batch, decrypt_transactions(batch)):
+            for column, value in transaction_blind_indexes(row["date"], row["type"], row["category"]).items():
+                setattr(t, column, value)
+            updated += 1
+        last_id = batch[-1].id
+        db.session.commit()
+        db.session.expunge_all()
+    return {"updated": updated}
@@ -1,7 +1,32 @@
 from datetime import date, datetime
+from sqlalchemy import event
 from .extensions import db
 
 
+class SchemaVersion(db.Model):
+    """Single row (id=1) recording the last migration applied by app.migrations."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class DataVersion(db.Model):
+    """Write counter per data scope ("company:<id>", "store"), maintained by app.versions."""
+
+    scope = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class ServerSession(db.Model):
+    """Server-side session data (app.sessions); id is a hash of the cookie's session id."""
+
+    id = db.Column(db.String(64), primary_key=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
@@ -9,6 +34,9 @@ class Product(db.Model):
     price = db.Column(db.Numeric(10, 2), nullable=False)
     stock_qty = db.Column(db.Integer, nullable=False, default=0)
     low_stock_threshold = db.Column(db.Integer, nullable=False, default=10)
+    # stock_qty <= low_stock_threshold, kept in sync by the mapper events below
+    # and by bulk stock UPDATEs (app.checkout), so alerts can use the index
+    low_stock = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false(), index=True)
 
     sales = db.relationship("Sale", backref="product", lazy=True)
 
@@ -32,18 +60,71 @@ class Customer(db.Model):
         return f"<Customer {self.name}>"
 
 
+@event.listens_for(Product, "before_insert")
+@event.listens_for(Product, "before_update")
+def _sync_low_stock(_mapper, _connection, target):
+    # Column defaults are applied after this hook, so resolve them here
+    columns = Product.__table__.c
+    stock = target.stock_qty if target.stock_qty is not None else columns.stock_qty.default.arg
+    threshold = target.low_stock_threshold
+    if threshold is None:
+        threshold = columns.low_stock_threshold.default.arg
+    target.low_stock = stock <= threshold
+
+
+def _not_sqlite(ddl, target, bind, **kw):
+    return kw["dialect"].name != "sqlite"
+
+
+def _prefix_search_index(column) -> None:
+    """Index for ``LIKE 'prefix%'`` typeahead searches on ``column``.
+
+    SQLite only uses an index for case-insensitive LIKE when it is NOCASE;
+    other databases get a plain index (their default collations are
+    case-insensitive already).
+    """
+    table = column.table.name
+    db.Index(f"ix_{table}_{column.name}_nocase", column.collate("NOCASE")).ddl_if(dialect="sqlite")
+    db.Index(f"ix_{table}_{column.name}", column).ddl_if(callable_=_not_sqlite)
+
+
+for _column in (Product.name, Product.category, Customer.name, Customer.phone, Customer.email):
+    _prefix_search_index(_column)
+
+
 class Sale(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False)
-    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=True)
+    product_id = db.Column(db.Integer, db.ForeignKey("product.id"), nullable=False, index=True)
+    customer_id = db.Column(db.Integer, db.ForeignKey("customer.id"), nullable=True, index=True)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     total_price = db.Column(db.Numeric(10, 2), nullable=False)
-    sale_date = db.Column(db.Date, nullable=False, default=date.today)
+    sale_date = db.Column(db.Date, nullable=False, default=date.today, index=True)
 
     def __repr__(self):
         return f"<Sale {self.id} - Product {self.product_id} x{self.quantity}>"
 
 
+class SalesDailyRollup(db.Model):
+    """Sales totals per day x product x customer, maintained by app.sales_rollups.
+
+    customer_id is 0 for walk-in sales so the bucket key has no NULLs.
+    """
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    product_id = db.Column(db.Integer, nullable=False)
+    customer_id = db.Column(db.Integer, nullable=False, default=0)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint("day", "product_id", "customer_id", name="uq_sales_daily_bucket"),
+        db.Index("ix_sales_daily_product_day", "product_id", "day"),
+        db.Index("ix_sales_daily_customer_day", "customer_id", "day"),
+    )
+
+
 class Company(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False, unique=True)
@@ -53,6 +134,7 @@ class Company(db.Model):
 
     transactions = db.relationship("Transaction", backref="company", lazy=True, cascade="all, delete-orphan")
     otps = db.relationship("OTP", backref="company", lazy=True, cascade="all, delete-orphan")
+    rollups = db.relationship("TransactionRollup", backref="company", lazy=True, cascade="all, delete-orphan")
 
     def __repr__(self):
         return f"<Company {self.name}>"
@@ -67,19 +149,81 @@ class Transaction(db.Model):
     category_enc = db.Column(db.LargeBinary, nullable=False)
     amount_enc = db.Column(db.LargeBinary, nullable=False)
     notes_enc = db.Column(db.LargeBinary, nullable=True)
+    # Packed format: all fields above in one token; per-field columns are left empty (b"")
+    record_enc = db.Column(db.LargeBinary, nullable=True)
+    # Keyed-HMAC blind indexes so filters run in SQL without exposing plaintext
+    month_bidx = db.Column(db.String(32), nullable=True)  # "YYYY-MM"
+    type_bidx = db.Column(db.String(32), nullable=True)
+    category_bidx = db.Column(db.String(32), nullable=True)  # normalized category
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index("ix_transaction_company_month", "company_id", "month_bidx"),
+        db.Index("ix_transaction_company_category", "company_id", "category_bidx"),
+        db.Index("ix_transaction_company_created", "company_id", "created_at", "id"),
+    )
+
+    @property
+    def is_packed(self):
+        return self.record_enc is not None
+
     def __repr__(self):
         return f"<Transaction {self.id} company={self.company_id}>"
 
 
-class OTP(db.Model):
+class TransactionRollup(db.Model):
+    """Per-company month x type x category totals, kept in step with Transaction writes."""
+
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey("company.id"), nullable=False, index=True)
+    month_bidx = db.Column(db.String(32), nullable=False)
+    type_bidx = db.Column(db.String(32), nullable=False)
+    category_bidx = db.Column(db.String(32), nullable=False)
+    # Packed record (month, type, category, total, count) under one Fernet token
+    record_enc = db.Column(db.LargeBinary, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint("company_id", "month_bidx", "type_bidx", "category_bidx", name="uq_rollup_bucket"),
+    )
+
+    def __repr__(self):
+        return f"<TransactionRollup company={self.company_id}>"
+
+
+class OTP(db.Model):
+    __table_args__ = (
+        # Serves otp_verify's latest-pending lookup; also covers company_id alone
+        db.Index("ix_otp_company_verified_created", "company_id", "verified", "created_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    company_id = db.Column(db.Integer, db.ForeignKey("company.id"), nullable=False)
     code_hash = db.Column(db.String(255), nullable=False)
     expires_at = db.Column(db.DateTime, nullable=False)
     verified = db.Column(db.Boolean, nullable=False, default=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Verification attempts so far; claimed atomically before each check
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     def __repr__(self):
         return f"<OTP company={self.company_id} verified={self.verified}>"
+
+
+class EmailOutbox(db.Model):
+    """Queued outbound email, delivered by the background worker in app.outbox."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(255), nullable=False)
+    # Encrypted JSON (company name, code); cleared once delivery finishes
+    payload_enc = db.Column(db.LargeBinary, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index("ix_email_outbox_status_due", "status", "next_attempt_at"),)
+
+    def __repr__(self):
+        return f"<EmailOutbox {self.id} {self.status}>"
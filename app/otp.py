@@ -0,0 +1,57 @@
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+
+from flask import Flask
+
+from .extensions import db
+from .models import OTP
+
+# OTP retention. A login deletes the company's older pending codes before
+# issuing a new one, so otp_verify's (company_id, verified, created_at) index
+# lookup only ever sees the latest code. Expired and verified rows are deleted
+# in batches, opportunistically after logins (every OTP_SWEEP_INTERVAL
+# seconds) and by `flask sweep-otps`.
+
+_last_sweep = time.monotonic()
+_sweep_lock = threading.Lock()
+
+
+def invalidate_pending(company_id: int) -> int:
+    """Delete the company's unverified OTPs (in the caller's transaction)."""
+    return db.session.execute(
+        db.delete(OTP).where(OTP.company_id == company_id, OTP.verified.is_(False))
+    ).rowcount or 0
+
+
+def sweep_otps(batch_size: int = 500, now: Optional[datetime] = None) -> int:
+    """Delete expired and verified OTPs, committing every ``batch_size`` rows."""
+    now = now or datetime.utcnow()
+    removed = 0
+    while True:
+        ids = db.session.scalars(
+            db.select(OTP.id).where((OTP.expires_at < now) | OTP.verified.is_(True)).limit(batch_size)
+        ).all()
+        if not ids:
+            return removed
+        removed += db.session.execute(db.delete(OTP).where(OTP.id.in_(ids))).rowcount or 0
+        db.session.commit()
+        if len(ids) < batch_size:
+            return removed
+
+
+def maybe_sweep(app: Flask) -> None:
+    global _last_sweep
+    interval = app.config.get("OTP_SWEEP_INTERVAL", 3600)
+    if not interval or time.monotonic() - _last_sweep < interval:
+        return
+    if not _sweep_lock.acquire(blocking=False):
+        return
+    try:
+        _last_sweep = time.monotonic()
+        sweep_otps(app.config.get("OTP_SWEEP_BATCH", 500))
+    except Exception:  # noqa: BLE001 - sweeping is best effort
+        db.session.rollback()
+    finally:
+        _sweep_lock.release()
@@ -0,0 +1,149 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from typing import Optional
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+from .extensions import db
+from .models import EmailOutbox
+from .utils import decrypt_text, encrypt_text, send_email_otp_emailjs
+
+# One delivery thread per process, woken on enqueue and otherwise polling for
+# due retries. Rows are claimed with a conditional UPDATE that also sets a lease
+# (next_attempt_at in the future), so several gunicorn workers can share the
+# table and a row orphaned by a crashed worker is picked up once its lease ends.
+
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+_wake = threading.Event()
+_http: Optional[requests.Session] = None
+
+
+def _http_session() -> requests.Session:
+    global _http
+    if _http is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _http = session
+    return _http
+
+
+def enqueue_email(to_email: str, company_name: str, otp_code: str) -> EmailOutbox:
+    """Add an email to the outbox in the caller's session; call ``wake()`` after commit."""
+    msg = EmailOutbox(
+        to_email=to_email,
+        payload_enc=encrypt_text(json.dumps({"company_name": company_name, "otp_code": otp_code})),
+        status="pending",
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(msg)
+    return msg
+
+
+def wake() -> None:
+    """Nudge the delivery thread, starting it on first use."""
+    if current_app.config.get("OUTBOX_WORKER", True):
+        _ensure_worker(current_app._get_current_object())
+    _wake.set()
+
+
+def _claim(msg_id: int, now: datetime) -> bool:
+    lease = now + timedelta(seconds=current_app.config.get("EMAILJS_TIMEOUT", 20) * 2)
+    result = db.session.execute(
+        db.update(EmailOutbox)
+        .where(
+            EmailOutbox.id == msg_id,
+            EmailOutbox.status.in_(("pending", "sending")),
+            EmailOutbox.next_attempt_at <= now,
+        )
+        .values(status="sending", next_attempt_at=lease)
+    )
+    db.session.commit()
+    return result.rowcount == 1
+
+
+def deliver(msg: EmailOutbox) -> bool:
+    payload = json.loads(decrypt_text(msg.payload_enc) or "{}")
+    ok, err = send_email_otp_emailjs(
+        to_email=msg.to_email,
+        company_name=payload.get("company_name", ""),
+        otp_code=payload.get("otp_code", ""),
+        http=_http_session(),
+    )
+    msg.attempts += 1
+    now = datetime.utcnow()
+    if ok:
+        msg.status = "sent"
+        msg.sent_at = now
+        msg.last_error = None
+        msg.payload_enc = None
+    elif msg.attempts >= current_app.config.get("OUTBOX_MAX_ATTEMPTS", 5):
+        msg.status = "failed"
+        msg.last_error = err
+        msg.payload_enc = None
+    else:
+        base = current_app.config.get("OUTBOX_RETRY_BASE_SECONDS", 5)
+        msg.status = "pending"
+        msg.last_error = err
+        msg.next_attempt_at = now + timedelta(seconds=base * 2 ** (msg.attempts - 1))
+    db.session.commit()
+    return ok
+
+
+def drain(limit: int = 100) -> int:
+    """Deliver up to ``limit`` due messages; returns how many were attempted."""
+    now = datetime.utcnow()
+    due = [
+        msg_id
+        for (msg_id,) in db.session.query(EmailOutbox.id)
+        .filter(EmailOutbox.status.in_(("pending", "sending")), EmailOutbox.next_attempt_at <= now)
+        .order_by(EmailOutbox.next_attempt_at.asc())
+        .limit(limit)
+    ]
+    attempted = 0
+    for msg_id in due:
+        if not _claim(msg_id, now):
+            continue
+        deliver(db.session.get(EmailOutbox, msg_id))
+        attempted += 1
+    return attempted
+
+
+def _loop(app) -> None:
+    while True:
+        _wake.wait(app.config.get("OUTBOX_POLL_SECONDS", 5))
+        _wake.clear()
+        with app.app_context():
+            try:
+                drain()
+            except Exception as e:  # noqa: BLE001 - keep the worker alive
+                db.session.rollback()
+                app.logger.warning("Email outbox delivery failed: %s", e)
+            finally:
+                db.session.remove()
+
+
+def _ensure_worker(app) -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_loop, args=(app,), name="email-outbox", daemon=True)
+            _worker.start()
+
+
+def delivery_status(msg_id: Optional[int]) -> Optional[dict]:
+    msg = db.session.get(EmailOutbox, msg_id) if msg_id else None
+    if msg is None:
+        return None
+    return {
+        "id": msg.id,
+        "status": msg.status,
+        "attempts": msg.attempts,
+        "last_error": msg.last_error,
+        "sent_at": msg.sent_at.isoformat() if msg.sent_at else None,
+    }
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from flask import current_app
+
+# Jobs are identified by a hash of (company, range, data fingerprint), so the
+# same request against unchanged data maps to the same job and output file.
+# Status lives in a small JSON file next to the output, which lets any gunicorn
+# worker answer a status poll for a job another worker is rendering.
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _jobs_dir() -> str:
+    path = os.path.join(current_app.instance_path, "pdf_jobs")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _status_path(job_id: str) -> str:
+    return os.path.join(_jobs_dir(), f"{job_id}.json")
+
+
+def output_path(job_id: str) -> str:
+    return os.path.join(_jobs_dir(), f"{job_id}.pdf")
+
+
+def job_id_for(company_id: int, start: Optional[str], end: Optional[str], fingerprint: str) -> str:
+    raw = json.dumps([company_id, start or "", end or "", fingerprint])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _write_status(job_id: str, data: Dict[str, Any]) -> None:
+    path = _status_path(job_id)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def get_status(job_id: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_status_path(job_id), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get("PDF_JOB_WORKERS", 2),
+                thread_name_prefix="pdf-job",
+            )
+        return _executor
+
+
+def _run(app, job_id: str, status: Dict[str, Any], render: Callable[..., bytes], args: tuple) -> None:
+    with app.app_context():
+        status.update({"status": "running", "started_at": time.time()})
+        _write_status(job_id, status)
+        try:
+            pdf = render(*args)
+            path = output_path(job_id)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp, path)
+            status.update({"status": "done", "finished_at": time.time(), "size": len(pdf)})
+        except Exception as e:  # noqa: BLE001 - surfaced to the client via status
+            status.update({"status": "failed", "finished_at": time.time(), "error": str(e)})
+        _write_status(job_id, status)
+
+
+def submit(job_id: str, company_id: int, render: Callable[..., bytes], *args) -> Dict[str, Any]:
+    """Queue ``render(*args)`` unless the job already finished, is in flight, or failed moments ago."""
+    evict_expired()
+    status = get_status(job_id)
+    if status and status.get("company_id") == company_id:
+        if status["status"] == "done" and os.path.exists(output_path(job_id)):
+            return status
+        if status["status"] == "failed":
+            # Failures may be transient; hold them briefly so clients don't re-render in a loop
+            if time.time() - status.get("finished_at", 0) < current_app.config.get("PDF_FAILED_RETRY_SECONDS", 30):
+                return status
+        in_flight = status["status"] in ("queued", "running")
+        timeout = current_app.config.get("PDF_JOB_TIMEOUT", 600)
+        if in_flight and time.time() - status.get("submitted_at", 0) < timeout:
+            return status
+    status = {"job_id": job_id, "company_id": company_id, "status": "queued", "submitted_at": time.time()}
+    _write_status(job_id, status)
+    _get_executor().submit(_run, current_app._get_current_object(), job_id, dict(status), render, args)
+    return status
+
+
+def evict_expired() -> int:
+    """Delete job outputs and status files older than PDF_CACHE_TTL seconds."""
+    ttl = current_app.config.get("PDF_CACHE_TTL", 3600)
+    base = _jobs_dir()
+    cutoff = time.time() - ttl
+    removed = 0
+    for name in os.listdir(base):
+        path = os.path.join(base, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Optional, Tuple
+
+from flask import Flask, current_app, jsonify, make_response, request, session
+
+# Token-bucket throttling for the auth endpoints. Every POST takes one token
+# from a per-client-IP bucket and, when the request names an account, from a
+# per-account bucket; an empty bucket answers 429 with Retry-After before the
+# view runs, so no password or OTP hashing happens. Buckets live in process
+# memory by default (RATELIMIT_BACKEND=memory, per worker), or in a small
+# SQLite file shared by every worker on the host (RATELIMIT_BACKEND=sqlite).
+# Limits are "<burst>/<seconds>": that many requests at once, refilled evenly
+# over that many seconds.
+
+
+def parse_limit(value: str) -> Optional[Tuple[int, float]]:
+    """``"10/60"`` -> (capacity 10, refill 10 tokens per 60 s); empty or "0" disables."""
+    value = (value or "").strip()
+    if not value or value == "0":
+        return None
+    count, _, seconds = value.partition("/")
+    capacity = int(count)
+    period = float(seconds or 60)
+    if capacity <= 0 or period <= 0:
+        return None
+    return capacity, capacity / period
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: int, rate: float) -> float:
+    return min(float(capacity), tokens + (now - updated) * rate)
+
+
+class MemoryBucketStore:
+    """Buckets in a dict, shared by the threads of one process; least recently used keys are dropped past ``max_keys``."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (float(capacity), now))
+            tokens = _refill(tokens, updated, now, capacity, rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteBucketStore:
+    """Buckets in a SQLite file so gunicorn workers share one budget per key."""
+
+    def __init__(self, path: str, sweep_every: int = 1000):
+        self.path = path
+        self.sweep_every = sweep_every
+        self._local = threading.local()
+        self._calls = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_bucket ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_bucket_full_at ON rate_bucket (full_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        conn = self._conn()
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM rate_bucket WHERE key = ?", (key,)).fetchone()
+            tokens = _refill(row[0], row[1], now, capacity, rate) if row else float(capacity)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            full_at = now + (capacity - tokens) / rate
+            conn.execute(
+                "INSERT INTO rate_bucket (key, tokens, updated, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated, "
+                "full_at = excluded.full_at",
+                (key, tokens, now, full_at),
+            )
+            self._calls += 1
+            if self.sweep_every and self._calls % self.sweep_every == 0:
+                # A bucket that has refilled is the same as no row at all
+                conn.execute("DELETE FROM rate_bucket WHERE full_at < ?", (now,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM rate_bucket")
+
+
+class RateLimiter:
+    def __init__(self, store, ip_limit: Optional[Tuple[int, float]], account_limit: Optional[Tuple[int, float]]):
+        self.store = store
+        self.ip_limit = ip_limit
+        self.account_limit = account_limit
+
+    def check(self, scope: str, ip: Optional[str], account: Optional[str]) -> float:
+        """Seconds until the request may be retried (0 when allowed); takes a token from each bucket."""
+        now = time.time()
+        if self.ip_limit and ip:
+            wait = self.store.take(f"{scope}:ip:{ip}", *self.ip_limit, now)
+            if wait:
+                return wait
+        if self.account_limit and account:
+            return self.store.take(f"{scope}:acct:{account}", *self.account_limit, now)
+        return 0.0
+
+
+def init_ratelimit(app: Flask) -> None:
+    """Attach the RATELIMIT_* limiter as ``app.extensions["ratelimit"]`` (None when disabled)."""
+    limiter = None
+    if app.config.get("RATELIMIT_ENABLED", True):
+        backend = (app.config.get("RATELIMIT_BACKEND") or "memory").lower()
+        if backend == "sqlite":
+            store: Any = SQLiteBucketStore(
+                app.config.get("RATELIMIT_SQLITE_PATH") or os.path.join(app.instance_path, "ratelimit.sqlite3")
+            )
+        else:
+            if backend != "memory":
+                print(f"[WARN] Unknown RATELIMIT_BACKEND '{backend}'; using 'memory'.")
+            store = MemoryBucketStore()
+        limiter = RateLimiter(
+            store,
+            parse_limit(app.config.get("RATELIMIT_IP", "")),
+            parse_limit(app.config.get("RATELIMIT_ACCOUNT", "")),
+        )
+    app.extensions["ratelimit"] = limiter
+
+
+def _too_many(wait: float):
+    retry_after = max(1, int(wait + 0.999))
+    message = f"Too many attempts. Try again in {retry_after} seconds."
+    if request.accept_mimetypes.best == "application/json":
+        resp = make_response(jsonify({"error": message, "retry_after": retry_after}), 429)
+    else:
+        resp = make_response(message, 429)
+        resp.mimetype = "text/plain"
+    resp.headers["Retry-After"] = str(retry_after)
+    return resp
+
+
+def rate_limited(account: Callable[[], Optional[Any]] = lambda: None):
+    """Throttle POSTs to the view per client IP and per ``account()`` (e.g. the submitted email)."""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limiter: Optional[RateLimiter] = current_app.extensions.get("ratelimit")
+            if limiter is not None and request.method == "POST":
+                key = account()
+                wait = limiter.check(
+                    request.endpoint or view.__name__,
+                    request.remote_addr,
+                    str(key).strip().lower() if key else None,
+                )
+                if wait:
+                    return _too_many(wait)
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def form_email() -> Optional[str]:
+    return request.form.get("email")
+
+
+def pending_account() -> Optional[Any]:
+    return session.get("pending_company_id")
@@ -0,0 +1,158 @@
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.exc import IntegrityError
+
+from .extensions import db
+from .models import Transaction, TransactionRollup
+from .utils import (
+    decrypt_record,
+    decrypt_transactions,
+    encrypt_record,
+    normalize_category,
+    transaction_blind_indexes,
+)
+from .versions import company_scope, mark_changed
+
+
+def apply_transaction(company_id: int, row: Dict[str, Any], sign: int = 1) -> None:
+    """Add (sign=1) or remove (sign=-1) a decrypted transaction row from its rollup bucket.
+
+    Runs inside the caller's session so the bucket update commits atomically
+    with the transaction write itself.
+    """
+    _apply_delta(company_id, row["date"][:7], row["type"], row["category"], sign * row["amount"], sign)
+
+
+def apply_transactions(company_id: int, rows: List[Dict[str, Any]]) -> None:
+    """Add many decrypted rows, touching each rollup bucket once."""
+    deltas: Dict[tuple, list] = {}
+    for row in rows:
+        key = (row["date"][:7], row["type"], normalize_category(row["category"]))
+        entry = deltas.setdefault(key, [row["category"], Decimal("0"), 0])
+        entry[1] += row["amount"]
+        entry[2] += 1
+    for (month, t_type, _norm), (category, total, count) in deltas.items():
+        _apply_delta(company_id, month, t_type, category, total, count)
+
+
+def _apply_delta(company_id: int, month: str, t_type: str, category: str, amount: Decimal, count: int) -> None:
+    bidx = transaction_blind_indexes(month, t_type, category)
+    query = TransactionRollup.query.filter_by(company_id=company_id, **bidx).with_for_update()
+    bucket = query.first()
+    if bucket is None:
+        if count <= 0:
+            return
+        bucket = TransactionRollup(
+            company_id=company_id,
+            record_enc=encrypt_record((month, t_type, category, str(amount), str(count))),
+            **bidx,
+        )
+        try:
+            with db.session.begin_nested():
+                db.session.add(bucket)
+            return
+        except IntegrityError:
+            # A concurrent writer created this month's bucket first; update theirs
+            bucket = query.one()
+    month, t_type, category, total, n = _bucket_values(bucket)
+    total += amount
+    n += count
+    if n <= 0:
+        db.session.delete(bucket)
+        return
+    bucket.record_enc = encrypt_record((month, t_type, category, str(total), str(n)))
+
+
+def _bucket_values(bucket: TransactionRollup):
+    values = decrypt_record(bucket.record_enc) or ("", "", "", "0", "0")
+    month, t_type, category, total, count = values
+    return month, t_type, category, Decimal(total or "0"), int(count or "0")
+
+
+def load_rollups(company_id: int) -> List[Dict[str, Any]]:
+    """Decrypted rollup buckets for a company; O(months x types x categories).
+
+    Buckets for data predating rollups are built by schema migration 9.
+    """
+    buckets = TransactionRollup.query.filter_by(company_id=company_id).all()
+    out = []
+    for b in buckets:
+        month, t_type, category, total, count = _bucket_values(b)
+        out.append({"month": month, "type": t_type, "category": category, "total": total, "count": count})
+    return out
+
+
+def summarize(rollups: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Income/expense totals plus by-month, by-year and by-category breakdowns."""
+    by_month = defaultdict(lambda: {"income": Decimal("0"), "expense": Decimal("0")})
+    by_year = defaultdict(lambda: {"income": Decimal("0"), "expense": Decimal("0")})
+    by_category = defaultdict(Decimal)
+    total_income = Decimal("0")
+    total_expense = Decimal("0")
+    for r in rollups:
+        if r["type"] not in ("income", "expense"):
+            continue
+        by_month[r["month"]][r["type"]] += r["total"]
+        by_year[r["month"][:4]][r["type"]] += r["total"]
+        if r["type"] == "income":
+            total_income += r["total"]
+            by_category[r["category"] or "Unknown"] += r["total"]
+        else:
+            total_expense += r["total"]
+            by_category[r["category"] or "Unknown"] -= r["total"]
+    return {
+        "total_income": total_income,
+        "total_expense": total_expense,
+        "by_month": by_month,
+        "by_year": by_year,
+        "by_category": by_category,
+    }
+
+
+def rebuild_rollups(company_id: Optional[int] = None, batch_size: int = 500) -> int:
+    """Recompute rollup buckets from transactions; all companies when company_id is None."""
+    if company_id is None:
+        ids = [cid for (cid,) in db.session.query(Transaction.company_id).distinct()]
+        # Companies that lose buckets without regaining any still need their pages refreshed
+        for (cid,) in db.session.query(TransactionRollup.company_id).distinct():
+            mark_changed(company_scope(cid))
+        TransactionRollup.query.delete(synchronize_session=False)
+        db.session.commit()
+        return sum(rebuild_rollups(cid, batch_size) for cid in ids)
+
+    mark_changed(company_scope(company_id))
+    TransactionRollup.query.filter_by(company_id=company_id).delete(synchronize_session=False)
+    buckets: Dict[tuple, list] = {}
+    last_id = 0
+    count = 0
+    while True:
+        batch = (
+            Transaction.query.filter(Transaction.company_id == company_id, Transaction.id > last_id)
+            .order_by(Transaction.id.asc())
+            .limit(batch_size)
+            .all()
+        )
+        if not batch:
+            break
+        for row in decrypt_transactions(batch):
+            bidx = transaction_blind_indexes(row["date"], row["type"], row["category"])
+            key = (bidx["month_bidx"], bidx["type_bidx"], bidx["category_bidx"])
+            entry = buckets.setdefault(key, [row["date"][:7], row["type"], row["category"], Decimal("0"), 0])
+            entry[3] += row["amount"]
+            entry[4] += 1
+            count += 1
+        last_id = batch[-1].id
+    for (month_bidx, type_bidx, category_bidx), (month, t_type, category, total, n) in buckets.items():
+        db.session.add(
+            TransactionRollup(
+                company_id=company_id,
+                month_bidx=month_bidx,
+                type_bidx=type_bidx,
+                category_bidx=category_bidx,
+                record_enc=encrypt_record((month, t_type, category, str(total), str(n))),
+            )
+        )
+    db.session.commit()
+    return count
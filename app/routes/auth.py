@@ -1,14 +1,16 @@
 from datetime import datetime, timedelta
 
-from flask import Blueprint, current_app, flash, redirect, render_template, request, session, url_for
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, session, url_for
 
+from .. import outbox
 from ..extensions import db
 from ..models import Company, OTP
+from ..otp import invalidate_pending, maybe_sweep
+from ..ratelimit import form_email, pending_account, rate_limited
 from ..utils import (
     generate_otp,
     hash_otp,
     hash_password,
-    send_email_otp_emailjs,
     verify_otp_hash,
     verify_password,
 )
@@ -18,6 +20,7 @@ bp = Blueprint("auth", __name__)
 
 
 @bp.route("/signup", methods=["GET", "POST"])
+@rate_limited(account=form_email)
 def signup():
     if request.method == "POST":
         name = request.form.get("name", "").strip()
@@ -31,14 +34,10 @@ def signup():
             return render_template("signup.html")
         company = Company(name=name, email=email, password_hash=hash_password(password))
         db.session.add(company)
+        # Welcome email goes out through the outbox in the background
+        outbox.enqueue_email(to_email=email, company_name=name, otp_code="WELCOME")
         db.session.commit()
-
-        # Send welcome email using EmailJS
-        _ok, _err = send_email_otp_emailjs(
-            to_email=email,
-            company_name=name,
-            otp_code="WELCOME",
-        )
+        outbox.wake()
 
         flash("Signup successful. Please login.", "success")
         return redirect(url_for("auth.login"))
@@ -46,6 +45,7 @@ def signup():
 
 
 @bp.route("/login", methods=["GET", "POST"])
+@rate_limited(account=form_email)
 def login():
     if request.method == "POST":
         email = request.form.get("email", "").strip().lower()
@@ -55,7 +55,8 @@ def login():
             flash("Invalid credentials.", "danger")
             return render_template("login.html")
 
-        # Generate and send OTP
+        # Generate and send OTP; it supersedes any code still pending
+        invalidate_pending(company.id)
         code = generate_otp()
         otp = OTP(
             company_id=company.id,
@@ -63,21 +64,21 @@ def login():
             expires_at=datetime.utcnow() + timedelta(minutes=current_app.config.get("OTP_EXPIRY_MINUTES", 10)),
         )
         db.session.add(otp)
+        msg = outbox.enqueue_email(to_email=company.email, company_name=company.name, otp_code=code)
         db.session.commit()
-
-        ok, err = send_email_otp_emailjs(to_email=company.email, company_name=company.name, otp_code=code)
-        if not ok:
-            flash(f"Failed to send OTP email: {err}", "danger")
-            return render_template("login.html")
+        outbox.wake()
+        maybe_sweep(current_app._get_current_object())
 
         session.clear()
         session["pending_company_id"] = company.id
-        flash("OTP sent to your registered email.", "info")
+        session["otp_outbox_id"] = msg.id
+        flash("OTP is being sent to your registered email.", "info")
         return redirect(url_for("auth.otp_verify"))
     return render_template("login.html")
 
 
 @bp.route("/otp-verify", methods=["GET", "POST"])
+@rate_limited(account=pending_account)
 def otp_verify():
     pending_id = session.get("pending_company_id")
     if not pending_id:
@@ -100,6 +101,16 @@ def otp_verify():
         if datetime.utcnow() > otp.expires_at:
             flash("OTP expired. Please login again.", "danger")
             return redirect(url_for("auth.login"))
+        # Claim an attempt with a conditional UPDATE so parallel guesses can't exceed the limit
+        claimed = db.session.execute(
+            db.update(OTP)
+            .where(OTP.id == otp.id, OTP.attempts < current_app.config.get("OTP_MAX_ATTEMPTS", 5))
+            .values(attempts=OTP.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        if not claimed:
+            flash("Too many attempts. Please login again.", "danger")
+            return redirect(url_for("auth.login"))
         if not verify_otp_hash(otp.code_hash, code):
             flash("Invalid OTP.", "danger")
             return render_template("otp_verify.html")
@@ -112,7 +123,18 @@ def otp_verify():
         session["otp_verified"] = True
         flash("Logged in successfully.", "success")
         return redirect(url_for("dashboard.index"))
-    return render_template("otp_verify.html")
+    return render_template("otp_verify.html", delivery=outbox.delivery_status(session.get("otp_outbox_id")))
+
+
+@bp.route("/otp-status")
+def otp_status():
+    """Delivery status of the OTP email for the login in progress."""
+    if not session.get("pending_company_id"):
+        return jsonify({"error": "No login in progress."}), 404
+    status = outbox.delivery_status(session.get("otp_outbox_id"))
+    if status is None:
+        return jsonify({"error": "Not found."}), 404
+    return jsonify(status)
 
 
 @bp.route("/logout")
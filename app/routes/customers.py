@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from ..extensions import db
 from ..models import Customer
+from ..search import search_customers
 
 
 bp = Blueprint("customers", __name__)
@@ -12,6 +13,12 @@ def list_customers():
     return render_template("customers_list.html", customers=customers)
 
 
+@bp.route("/search")
+def search():
+    """Typeahead: ?q=<prefix of name, phone or email>&limit=N."""
+    return jsonify(search_customers(request.args.get("q", ""), request.args.get("limit", type=int)))
+
+
 @bp.route("/new", methods=["GET", "POST"])
 def new_customer():
     if request.method == "POST":
@@ -1,10 +1,9 @@
-from collections import defaultdict
-from decimal import Decimal
-
 from flask import Blueprint, redirect, render_template, session, url_for
 
+from ..cache import cached_transaction_rows
 from ..models import Transaction
-from ..utils import decrypt_decimal, decrypt_text
+from ..rollups import load_rollups, summarize
+from ..versions import company_scope, versioned_response
 
 
 bp = Blueprint("dashboard", __name__)
@@ -22,33 +21,28 @@ def index():
     if guard:
         return guard
     company_id = session["company_id"]
-    txns = Transaction.query.filter_by(company_id=company_id).order_by(Transaction.created_at.desc()).limit(10).all()
+    return versioned_response([company_scope(company_id)], lambda: _render_dashboard(company_id))
 
-    total_income = Decimal("0")
-    total_expense = Decimal("0")
-    category_totals = defaultdict(Decimal)
+
+def _render_dashboard(company_id: int) -> str:
+    txns = Transaction.query.filter_by(company_id=company_id).order_by(Transaction.created_at.desc()).limit(10).all()
     recent = []
-    for t in txns:
-        t_type = (decrypt_text(t.type_enc) or "").lower()
-        amt = decrypt_decimal(t.amount_enc)
-        category = decrypt_text(t.category_enc) or "Unknown"
-        date_str = decrypt_text(t.date_enc) or ""
-        if t_type == "income":
-            total_income += amt
-            category_totals[category] += amt
-        elif t_type == "expense":
-            total_expense += amt
-            category_totals[category] -= amt
+    for t, row in zip(txns, cached_transaction_rows(txns)):
         recent.append(
             {
                 "id": t.id,
-                "date": date_str,
-                "type": t_type,
-                "category": category,
-                "amount": amt,
+                "date": row["date"],
+                "type": row["type"],
+                "category": row["category"] or "Unknown",
+                "amount": row["amount"],
             }
         )
 
+    # Totals come from the monthly rollups, not from the recent rows above
+    summary = summarize(load_rollups(company_id))
+    total_income = summary["total_income"]
+    total_expense = summary["total_expense"]
+    category_totals = summary["by_category"]
     net_savings = total_income - total_expense
 
     # Prepare simple chart data
@@ -1,41 +1,49 @@
 from datetime import date
 from flask import Blueprint, render_template
-from sqlalchemy import func
+from sqlalchemy import func, select
+from ..cache import cached_store_metrics
+from ..extensions import db
 from ..models import Product, Customer, Sale
+from ..versions import STORE_SCOPE, versioned_response
 
 
 bp = Blueprint("main", __name__)
 
 
+def _store_metrics(today: date) -> dict:
+    """All dashboard counters in one round trip."""
+    row = db.session.execute(
+        select(
+            select(func.count(Product.id)).scalar_subquery(),
+            select(func.count(Product.id)).where(Product.low_stock).scalar_subquery(),
+            select(func.count(Customer.id)).scalar_subquery(),
+            select(func.sum(Sale.total_price)).where(Sale.sale_date == today).scalar_subquery(),
+        )
+    ).one()
+    products_count, low_stock_count, customers_count, today_total = row
+    return {
+        "products_count": products_count,
+        "customers_count": customers_count,
+        "low_stock_count": int(low_stock_count or 0),
+        "today_revenue": float(today_total) if today_total else 0.0,
+    }
+
+
 @bp.route("/")
 def index():
     today = date.today()
-    
-    products = Product.query.order_by(Product.name.asc()).all()
-    customers = Customer.query.order_by(Customer.name.asc()).all()
+    return versioned_response([STORE_SCOPE], lambda: _render_index(today), vary=[today.isoformat()])
+
+
+def _render_index(today: date) -> str:
+    metrics = cached_store_metrics(("index", today), lambda: _store_metrics(today))
+
     recent_sales = Sale.query.order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(20).all()
-    
-    # Calculate metrics
-    total_products = Product.query.count()
-    total_customers = Customer.query.count()
-    low_stock_count = sum(1 for p in products if p.is_low_stock)
-    
-    # Today's sales
-    today_sales = (
-        Sale.query
-        .filter(Sale.sale_date == today)
-        .with_entities(func.sum(Sale.total_price).label('total'))
-        .first()
-    )
-    today_revenue = float(today_sales.total) if today_sales.total else 0.0
-    
-    metrics = {
-        "products_count": total_products,
-        "customers_count": total_customers,
-        "low_stock_count": low_stock_count,
-        "today_revenue": today_revenue,
-    }
-    
+    # Only the products/customers referenced by the rows on screen
+    product_ids = {s.product_id for s in recent_sales}
+    customer_ids = {s.customer_id for s in recent_sales if s.customer_id}
+    products = Product.query.filter(Product.id.in_(product_ids)).order_by(Product.name.asc()).all() if product_ids else []
+    customers = Customer.query.filter(Customer.id.in_(customer_ids)).order_by(Customer.name.asc()).all() if customer_ids else []
     products_map = {p.id: p for p in products}
     customers_map = {c.id: c for c in customers}
 
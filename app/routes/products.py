@@ -1,6 +1,7 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from ..extensions import db
 from ..models import Product
+from ..search import search_products
 
 
 bp = Blueprint("products", __name__)
@@ -12,6 +13,27 @@ def list_products():
     return render_template("products_list.html", products=products)
 
 
+@bp.route("/search")
+def search():
+    """Typeahead: ?q=<prefix of name or category>&limit=N."""
+    return jsonify(search_products(request.args.get("q", ""), request.args.get("limit", type=int)))
+
+
+@bp.route("/low-stock")
+def low_stock():
+    """Products at or below their threshold, lowest stock first: ?limit=N (default 100, max 500)."""
+    limit = max(1, min(request.args.get("limit", 100, type=int) or 100, 500))
+    query = Product.query.filter(Product.low_stock)
+    items = query.order_by(Product.stock_qty.asc(), Product.name.asc()).limit(limit).all()
+    return jsonify({
+        "count": query.count(),
+        "items": [
+            {"id": p.id, "name": p.name, "category": p.category, "stock_qty": p.stock_qty, "low_stock_threshold": p.low_stock_threshold}
+            for p in items
+        ],
+    })
+
+
 @bp.route("/new", methods=["GET", "POST"])
 def new_product():
     if request.method == "POST":
@@ -1,55 +1,67 @@
 from datetime import date, timedelta
-from flask import Blueprint, render_template
-from sqlalchemy import func
+from flask import Blueprint, render_template, request
 from ..models import Sale, Product
+from ..sales_rollups import range_totals, top_customers, top_products
+from ..versions import STORE_SCOPE, versioned_response
 
 
 bp = Blueprint("reports", __name__)
 
+DEFAULT_RANGE_DAYS = 30
+MAX_TOP_N = 100
+
+
+def _parse_date(value, default):
+    try:
+        return date.fromisoformat(value) if value else default
+    except ValueError:
+        return default
+
 
 @bp.route("/")
 def view_reports():
     today = date.today()
+    return versioned_response([STORE_SCOPE], lambda: _render_reports(today), vary=[today.isoformat()])
+
+
+def _render_reports(today: date) -> str:
     week_ago = today - timedelta(days=7)
-    
-    # Daily sales summary
-    daily_sales = (
-        Sale.query
-        .filter(Sale.sale_date == today)
-        .with_entities(func.sum(Sale.total_price).label('total'), func.count(Sale.id).label('count'))
-        .first()
-    )
-    daily_total = float(daily_sales.total) if daily_sales.total else 0.0
-    daily_count = daily_sales.count if daily_sales.count else 0
-    
-    # Weekly sales summary
-    weekly_sales = (
-        Sale.query
-        .filter(Sale.sale_date >= week_ago)
-        .with_entities(func.sum(Sale.total_price).label('total'), func.count(Sale.id).label('count'))
-        .first()
-    )
-    weekly_total = float(weekly_sales.total) if weekly_sales.total else 0.0
-    weekly_count = weekly_sales.count if weekly_sales.count else 0
-    
-    # Stock status
-    all_products = Product.query.order_by(Product.name.asc()).all()
-    low_stock_products = [p for p in all_products if p.is_low_stock]
-    
+
+    # Daily and weekly summaries from the daily rollups
+    daily = range_totals(today, today)
+    weekly = range_totals(week_ago, today)
+
+    # Arbitrary range (?start=&end=) with top-N products and customers
+    range_end = _parse_date(request.args.get("end"), today)
+    range_start = _parse_date(request.args.get("start"), range_end - timedelta(days=DEFAULT_RANGE_DAYS - 1))
+    top_n = max(1, min(request.args.get("top", 10, type=int) or 10, MAX_TOP_N))
+    range_summary = range_totals(range_start, range_end)
+
+    # Stock status from the indexed low_stock flag
+    low_stock_products = Product.query.filter(Product.low_stock).order_by(Product.name.asc()).all()
+
     # Recent sales (last 10)
     recent_sales = Sale.query.order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(10).all()
-    
-    # Create maps for template access
-    products_map = {p.id: p for p in all_products}
-    
+
+    # Create maps for template access (only products the recent sales reference)
+    product_ids = {s.product_id for s in recent_sales}
+    products_map = {p.id: p for p in Product.query.filter(Product.id.in_(product_ids))} if product_ids else {}
+
     return render_template(
         "reports.html",
-        daily_total=daily_total,
-        daily_count=daily_count,
-        weekly_total=weekly_total,
-        weekly_count=weekly_count,
+        daily_total=daily["revenue"],
+        daily_count=daily["count"],
+        weekly_total=weekly["revenue"],
+        weekly_count=weekly["count"],
+        range_start=range_start,
+        range_end=range_end,
+        range_total=range_summary["revenue"],
+        range_count=range_summary["count"],
+        range_quantity=range_summary["quantity"],
+        top_products=top_products(range_start, range_end, top_n),
+        top_customers=top_customers(range_start, range_end, top_n),
+        top_n=top_n,
         low_stock_products=low_stock_products,
-        all_products=all_products,
         recent_sales=recent_sales,
         products_map=products_map
     )
@@ -1,12 +1,34 @@
+import csv
+import os
+import zlib
 from collections import defaultdict
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
 from io import StringIO
+from typing import List, Optional
 
-from flask import Blueprint, Response, redirect, render_template, request, session, url_for, make_response
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    send_file,
+    session,
+    stream_with_context,
+    url_for,
+)
+from sqlalchemy import or_
 
+from .. import pdf_jobs
+from ..cache import cached_transaction_rows
 from ..models import Transaction
-from ..utils import decrypt_decimal, decrypt_text
+from ..rollups import load_rollups, summarize
+from ..utils import blind_index, normalize_category
+from ..versions import company_scope, current_versions, versioned_response
 
 
 bp = Blueprint("reports_ie", __name__)
@@ -18,6 +40,73 @@ def _require_auth_redirect():
     return None
 
 
+# Date ranges spanning more months than this are filtered in Python instead
+MAX_PUSHDOWN_MONTHS = 240
+
+
+def _months_between(start: Optional[str], end: Optional[str]) -> Optional[List[str]]:
+    """All "YYYY-MM" buckets touched by [start, end], or None if not bounded."""
+    if not start or not end:
+        return None
+    try:
+        first = date.fromisoformat(start[:10])
+        last = date.fromisoformat(end[:10])
+    except ValueError:
+        return None
+    if last < first:
+        return []
+    count = (last.year - first.year) * 12 + (last.month - first.month) + 1
+    if count > MAX_PUSHDOWN_MONTHS:
+        return None
+    months = []
+    y, m = first.year, first.month
+    for _ in range(count):
+        months.append(f"{y:04d}-{m:02d}")
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return months
+
+
+def _filtered_transactions(company_id: int, start: Optional[str], end: Optional[str], category_filter: str = ""):
+    """Query narrowed by blind indexes; rows still need ``_row_matches`` for exact bounds."""
+    query = Transaction.query.filter_by(company_id=company_id)
+    months = _months_between(start, end)
+    if months is None and not category_filter:
+        return query
+    # Rows written before blind indexes existed can only be filtered after decryption
+    unindexed = query.filter(Transaction.month_bidx.is_(None)).with_entities(Transaction.id).first() is not None
+    if months is not None:
+        cond = Transaction.month_bidx.in_([blind_index("month", m) for m in months])
+        query = query.filter(or_(cond, Transaction.month_bidx.is_(None)) if unindexed else cond)
+    if category_filter:
+        cond = Transaction.category_bidx == blind_index("category", normalize_category(category_filter))
+        query = query.filter(or_(cond, Transaction.category_bidx.is_(None)) if unindexed else cond)
+    return query
+
+
+def _month_aligned(start: Optional[str], end: Optional[str]) -> bool:
+    """True when the range covers whole months, so rollup buckets answer it exactly."""
+    try:
+        if start and date.fromisoformat(start[:10]).day != 1:
+            return False
+        if end:
+            last = date.fromisoformat(end[:10])
+            if (last + timedelta(days=1)).day != 1:
+                return False
+    except ValueError:
+        return False
+    return True
+
+
+def _row_matches(row: dict, start: Optional[str], end: Optional[str], category_filter: str = "") -> bool:
+    if start and row["date"] < start:
+        return False
+    if end and row["date"] > end:
+        return False
+    if category_filter and normalize_category(row["category"]) != normalize_category(category_filter):
+        return False
+    return True
+
+
 @bp.route("/reports", methods=["GET"])  # /reports for income-expense manager
 def reports_page():
     guard = _require_auth_redirect()
@@ -27,34 +116,80 @@ def reports_page():
     start = request.args.get("start")
     end = request.args.get("end")
     category_filter = (request.args.get("category") or "").strip()
+    return versioned_response(
+        [company_scope(company_id)],
+        lambda: _render_reports(company_id, start, end, category_filter),
+    )
+
 
-    txns = Transaction.query.filter_by(company_id=company_id).all()
+def _render_reports(company_id: int, start: Optional[str], end: Optional[str], category_filter: str) -> str:
+    txns = _filtered_transactions(company_id, start, end, category_filter).all()
     rows = []
-    for t in txns:
-        date_str = decrypt_text(t.date_enc) or ""
-        t_type = decrypt_text(t.type_enc) or ""
-        category = decrypt_text(t.category_enc) or ""
-        amt = decrypt_decimal(t.amount_enc)
-        if start and date_str < start:
+    for row in cached_transaction_rows(txns):
+        if not _row_matches(row, start, end, category_filter):
             continue
-        if end and date_str > end:
-            continue
-        if category_filter and category_filter.lower() not in category.lower():
-            continue
-        rows.append({"date": date_str, "type": t_type, "category": category, "amount": amt})
+        rows.append({"date": row["date"], "type": row["type"], "category": row["category"], "amount": row["amount"]})
 
-    # Summaries
-    by_month = defaultdict(lambda: {"income": Decimal("0"), "expense": Decimal("0")})
-    by_year = defaultdict(lambda: {"income": Decimal("0"), "expense": Decimal("0")})
-    for r in rows:
-        y, m, _ = r["date"].split("-")
-        key_m = f"{y}-{m}"
-        by_month[key_m][r["type"]] += r["amount"]
-        by_year[y][r["type"]] += r["amount"]
+    # Summaries: whole-month ranges are answered from the rollup table
+    if _month_aligned(start, end):
+        buckets = [
+            b for b in load_rollups(company_id)
+            if (not start or b["month"] >= start[:7])
+            and (not end or b["month"] <= end[:7])
+            and (not category_filter or normalize_category(b["category"]) == normalize_category(category_filter))
+        ]
+        summary = summarize(buckets)
+        by_month, by_year = summary["by_month"], summary["by_year"]
+    else:
+        by_month = defaultdict(lambda: {"income": Decimal("0"), "expense": Decimal("0")})
+        by_year = defaultdict(lambda: {"income": Decimal("0"), "expense": Decimal("0")})
+        for r in rows:
+            if r["type"] not in ("income", "expense"):
+                continue
+            y, m, _ = r["date"].split("-")
+            key_m = f"{y}-{m}"
+            by_month[key_m][r["type"]] += r["amount"]
+            by_year[y][r["type"]] += r["amount"]
 
     return render_template("reports.html", rows=rows, by_month=by_month, by_year=by_year, start=start, end=end, category=category_filter)
 
 
+def _iter_csv(company_id: int, start: Optional[str], end: Optional[str], category_filter: str, batch_size: int):
+    """Yield the statement CSV in chunks, decrypting ``batch_size`` rows at a time."""
+    buf = StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(["date", "type", "category", "amount"])
+    query = _filtered_transactions(company_id, start, end, category_filter).order_by(Transaction.id.asc())
+    batch = []
+
+    def flush():
+        for row in cached_transaction_rows(batch):
+            if _row_matches(row, start, end, category_filter):
+                writer.writerow([row["date"], row["type"], row["category"], row["amount"]])
+        batch.clear()
+        chunk = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        return chunk
+
+    yield flush()
+    for t in query.yield_per(batch_size):
+        batch.append(t)
+        if len(batch) >= batch_size:
+            yield flush()
+    if batch:
+        yield flush()
+
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @bp.route("/reports/download", methods=["GET"])  # CSV download
 def download_csv():
     guard = _require_auth_redirect()
@@ -65,70 +200,137 @@ def download_csv():
     end = request.args.get("end")
     category_filter = (request.args.get("category") or "").strip()
 
-    txns = Transaction.query.filter_by(company_id=company_id).all()
-    sio = StringIO()
-    sio.write("date,type,category,amount\n")
-    for t in txns:
-        date_str = decrypt_text(t.date_enc) or ""
-        t_type = decrypt_text(t.type_enc) or ""
-        category = decrypt_text(t.category_enc) or ""
-        amt = decrypt_decimal(t.amount_enc)
-        if start and date_str < start:
-            continue
-        if end and date_str > end:
-            continue
-        if category_filter and category_filter.lower() not in category.lower():
-            continue
-        sio.write(f"{date_str},{t_type},{category},{amt}\n")
+    gzip = current_app.config.get("CSV_GZIP", True) and bool(request.accept_encodings["gzip"])
 
-    sio.seek(0)
+    def build():
+        chunks = _iter_csv(company_id, start, end, category_filter, current_app.config.get("CSV_STREAM_BATCH", 500))
+        ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
+        headers = {"Content-Disposition": f"attachment; filename=statement_{ts}.csv"}
+        if gzip:
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+            body = _gzip_stream(chunks)
+        else:
+            body = chunks
+        return Response(stream_with_context(body), mimetype="text/csv", headers=headers)
+
+    # Streamed, so only conditional requests are short-circuited; the body isn't kept
+    return versioned_response(
+        [company_scope(company_id)], build, cache_body=False, vary=["gzip" if gzip else "identity"]
+    )
+
+
+def _statement_fingerprint(company_id: int) -> str:
+    """Changes whenever any of the company's transactions do."""
+    scope = company_scope(company_id)
+    version, updated_at = current_versions([scope])[scope]
+    # The timestamp keeps ids distinct if the database is recreated and counters restart
+    return f"v{version}@{updated_at.isoformat() if updated_at else ''}"
+
+
+def _render_statement_pdf(company_id: int, start: Optional[str], end: Optional[str]) -> bytes:
+    """Runs on a PDF job worker thread under an app context."""
+    txns = _filtered_transactions(company_id, start, end).all()
+    rows = cached_transaction_rows(txns)
+    rows = [r for r in rows if _row_matches(r, start, end)]
+
+    # Render HTML and convert to PDF; no request here, so skip render_template's context processors
+    html = current_app.jinja_env.get_template("pdf_transactions.html").render(rows=rows, start=start, end=end)
+    from xhtml2pdf import pisa  # type: ignore
+
+    from io import BytesIO
+    pdf_io = BytesIO()
+    result = pisa.CreatePDF(html, dest=pdf_io)
+    if result.err:
+        raise RuntimeError("Failed to generate PDF")
+    return pdf_io.getvalue()
+
+
+def _submit_pdf_job(company_id: int, start: Optional[str], end: Optional[str]) -> dict:
+    job_id = pdf_jobs.job_id_for(company_id, start, end, _statement_fingerprint(company_id))
+    return pdf_jobs.submit(job_id, company_id, _render_statement_pdf, company_id, start, end)
+
+
+def _job_payload(status: dict) -> dict:
+    job_id = status["job_id"]
+    payload = {k: status.get(k) for k in ("job_id", "status", "error")}
+    payload["status_url"] = url_for("reports_ie.pdf_job_status", job_id=job_id)
+    if status["status"] == "done":
+        payload["download_url"] = url_for("reports_ie.pdf_job_download", job_id=job_id)
+    return payload
+
+
+def _owned_job(job_id: str):
+    status = pdf_jobs.get_status(job_id)
+    if not status or status.get("company_id") != session["company_id"]:
+        return None
+    return status
+
+
+def _send_job_pdf(job_id: str):
     ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    return Response(
-        sio.read(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=statement_{ts}.csv"},
+    return send_file(
+        pdf_jobs.output_path(job_id),
+        mimetype="application/pdf",
+        as_attachment=True,
+        download_name=f"transactions_{ts}.pdf",
     )
 
 
 @bp.route("/reports/download-pdf", methods=["GET"])  # PDF download
 def download_pdf():
+    """Serve the statement PDF if already rendered, otherwise queue it and show a waiting page."""
     guard = _require_auth_redirect()
     if guard:
         return guard
     company_id = session["company_id"]
     start = request.args.get("start")
     end = request.args.get("end")
-
-    txns = Transaction.query.filter_by(company_id=company_id).all()
-    rows = []
-    for t in txns:
-        date_str = decrypt_text(t.date_enc) or ""
-        t_type = decrypt_text(t.type_enc) or ""
-        category = decrypt_text(t.category_enc) or ""
-        amt = decrypt_decimal(t.amount_enc)
-        if start and date_str < start:
-            continue
-        if end and date_str > end:
-            continue
-        rows.append({"date": date_str, "type": t_type, "category": category, "amount": amt, "notes": decrypt_text(t.notes_enc) or ""})
-
-    # Render HTML and convert to PDF
-    html = render_template("pdf_transactions.html", rows=rows, start=start, end=end)
     try:
-        from xhtml2pdf import pisa  # type: ignore
+        from xhtml2pdf import pisa  # type: ignore  # noqa: F401
     except Exception as e:
         return make_response(f"PDF generation unavailable: {e}", 500)
 
-    from io import BytesIO
-    pdf_io = BytesIO()
-    result = pisa.CreatePDF(html, dest=pdf_io)
-    if result.err:
-        return make_response("Failed to generate PDF", 500)
-    pdf_io.seek(0)
-    ts = datetime.utcnow().strftime("%Y%m%d%H%M%S")
-    resp = make_response(pdf_io.read())
-    resp.headers["Content-Type"] = "application/pdf"
-    resp.headers["Content-Disposition"] = f"attachment; filename=transactions_{ts}.pdf"
-    return resp
+    def build():
+        status = _submit_pdf_job(company_id, start, end)
+        if status["status"] == "done":
+            return _send_job_pdf(status["job_id"])
+        if status["status"] == "failed":
+            return make_response(status.get("error") or "Failed to generate PDF", 500)
+        return render_template("pdf_job.html", job=_job_payload(status), start=start, end=end), 202
+
+    # Only a finished PDF (200) carries the ETag; the waiting page is never cached
+    return versioned_response([company_scope(company_id)], build, cache_body=False)
+
+
+@bp.route("/reports/pdf-jobs", methods=["POST"])
+def submit_pdf_job():
+    guard = _require_auth_redirect()
+    if guard:
+        return guard
+    start = request.values.get("start")
+    end = request.values.get("end")
+    status = _submit_pdf_job(session["company_id"], start, end)
+    return jsonify(_job_payload(status)), 202
 
 
+@bp.route("/reports/pdf-jobs/<job_id>", methods=["GET"])
+def pdf_job_status(job_id: str):
+    guard = _require_auth_redirect()
+    if guard:
+        return guard
+    status = _owned_job(job_id)
+    if not status:
+        return jsonify({"error": "not found"}), 404
+    return jsonify(_job_payload(status))
+
+
+@bp.route("/reports/pdf-jobs/<job_id>/download", methods=["GET"])
+def pdf_job_download(job_id: str):
+    guard = _require_auth_redirect()
+    if guard:
+        return guard
+    status = _owned_job(job_id)
+    if not status or status["status"] != "done" or not os.path.exists(pdf_jobs.output_path(job_id)):
+        return jsonify({"error": "not ready"}), 404
+    return _send_job_pdf(job_id)
@@ -1,6 +1,8 @@
 from datetime import date
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from decimal import Decimal
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from ..checkout import CheckoutError, InsufficientStock, checkout
 from ..extensions import db
 from ..models import Product, Customer, Sale
 
@@ -8,20 +10,72 @@ from ..models import Product, Customer, Sale
 bp = Blueprint("sales", __name__)
 
 
+SALES_PAGE_SIZES = (25, 50, 100, 200)
+DEFAULT_SALES_PAGE_SIZE = 50
+
+
+def _date_arg(name):
+    value = request.args.get(name)
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
 @bp.route("/")
 def list_sales():
-    sales = Sale.query.order_by(Sale.sale_date.desc(), Sale.id.desc()).all()
-    products = {p.id: p for p in Product.query.all()}
-    customers = {c.id: c for c in Customer.query.all()}
-    return render_template("sales_list.html", sales=sales, products=products, customers=customers)
+    start = _date_arg("start")
+    end = _date_arg("end")
+    product_id = request.args.get("product_id", type=int)
+    customer_id = request.args.get("customer_id", type=int)
+    per_page = request.args.get("per_page", DEFAULT_SALES_PAGE_SIZE, type=int)
+    if per_page not in SALES_PAGE_SIZES:
+        per_page = DEFAULT_SALES_PAGE_SIZE
+
+    query = select(Sale).options(joinedload(Sale.product), joinedload(Sale.customer))
+    if start:
+        query = query.where(Sale.sale_date >= start)
+    if end:
+        query = query.where(Sale.sale_date <= end)
+    if product_id:
+        query = query.where(Sale.product_id == product_id)
+    if customer_id:
+        query = query.where(Sale.customer_id == customer_id)
+    query = query.order_by(Sale.sale_date.desc(), Sale.id.desc())
+    pagination = db.paginate(query, per_page=per_page, max_per_page=max(SALES_PAGE_SIZES), error_out=False)
+
+    sales = pagination.items
+    # Names come from the joined rows; maps kept for templates that look them up by id
+    products = {s.product.id: s.product for s in sales if s.product}
+    customers = {s.customer.id: s.customer for s in sales if s.customer}
+    filters = {
+        "start": start.isoformat() if start else "",
+        "end": end.isoformat() if end else "",
+        "product_id": product_id or "",
+        "customer_id": customer_id or "",
+        "per_page": per_page,
+    }
+    return render_template(
+        "sales_list.html",
+        sales=sales,
+        products=products,
+        customers=customers,
+        pagination=pagination,
+        filters=filters,
+        page_sizes=SALES_PAGE_SIZES,
+    )
 
 
 @bp.route("/new", methods=["GET", "POST"])
 def new_sale():
-    products = Product.query.order_by(Product.name.asc()).all()
-    customers = Customer.query.order_by(Customer.name.asc()).all()
+    # The form looks products/customers up via the typeahead endpoints; only a
+    # preselected product/customer (?product_id=, ?customer_id=) is loaded here
+    selected_product = request.args.get("product_id", type=int)
+    selected_customer = request.args.get("customer_id", type=int)
+    products = Product.query.filter_by(id=selected_product).all() if selected_product else []
+    customers = Customer.query.filter_by(id=selected_customer).all() if selected_customer else []
     
-    if not products:
+    if not products and db.session.query(Product.id).first() is None:
         flash("Create a product first.")
     
     if request.method == "POST":
@@ -34,33 +88,56 @@ def new_sale():
         if not product_id:
             flash("Select a product.")
         else:
-            product = Product.query.get_or_404(int(product_id))
-            
-            if quantity <= 0:
-                flash("Quantity must be greater than 0.")
-            elif product.stock_qty < quantity:
-                flash(f"Insufficient stock. Available: {product.stock_qty}")
-            else:
-                sale_date = date.fromisoformat(date_str) if date_str else date.today()
-                total_price = Decimal(str(product.price)) * quantity
-                
-                sale = Sale(
-                    product_id=int(product_id),
+            sale_date = date.fromisoformat(date_str) if date_str else date.today()
+            try:
+                rows = checkout(
+                    [(int(product_id), quantity)],
                     customer_id=int(customer_id) if customer_id else None,
-                    quantity=quantity,
-                    total_price=total_price,
-                    sale_date=sale_date
+                    sale_date=sale_date,
                 )
-                db.session.add(sale)
-                
-                # Update product stock
-                product.stock_qty -= quantity
-                if product.stock_qty < 0:
-                    product.stock_qty = 0
-                
-                db.session.commit()
-                flash(f"Sale recorded successfully. Total: ${total_price:.2f}")
+            except InsufficientStock as e:
+                flash(f"Insufficient stock. Available: {e.available}")
+            except CheckoutError as e:
+                flash(str(e))
+            else:
+                flash(f"Sale recorded successfully. Total: ${rows[0]['total_price']:.2f}")
                 return redirect(next_url or url_for("sales.list_sales"))
     
-    return render_template("sale_form.html", products=products, customers=customers)
+    return render_template(
+        "sale_form.html",
+        products=products,
+        customers=customers,
+        product_search_url=url_for("products.search"),
+        customer_search_url=url_for("customers.search"),
+    )
+
 
+@bp.route("/checkout", methods=["POST"])
+def checkout_api():
+    """JSON checkout: {"customer_id", "sale_date", "items": [{"product_id", "quantity"}, ...]}."""
+    data = request.get_json(silent=True) or {}
+    try:
+        lines = [(int(item["product_id"]), int(item.get("quantity", 1))) for item in data.get("items") or []]
+        customer_id = int(data["customer_id"]) if data.get("customer_id") else None
+        sale_date = date.fromisoformat(data["sale_date"]) if data.get("sale_date") else None
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"error": "Malformed checkout request."}), 400
+    try:
+        rows = checkout(lines, customer_id=customer_id, sale_date=sale_date)
+    except InsufficientStock as e:
+        return jsonify({
+            "error": "insufficient_stock",
+            "product_id": e.product_id,
+            "requested": e.requested,
+            "available": e.available,
+        }), 409
+    except CheckoutError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({
+        "items": [
+            {"product_id": r["product_id"], "quantity": r["quantity"], "total_price": str(r["total_price"])}
+            for r in rows
+        ],
+        "total": str(sum(r["total_price"] for r in rows)),
+        "sale_date": rows[0]["sale_date"].isoformat(),
+    }), 201
@@ -1,6 +1,7 @@
 import os
 import re
 from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from ..db_profiles import PROFILES
 from ..extensions import db
 
 
@@ -19,6 +20,8 @@ def _current_info():
         "uri": str(url).replace(url.password or "", "***") if getattr(url, "password", None) else str(url),
     }
 
+    profile = current_app.config.get("DB_PROFILE") or {}
+    info["profile"] = profile.get("name", "legacy")
     if dialect == "sqlite":
         db_path = url.database or ""
         exists = os.path.exists(db_path) if db_path else False
@@ -28,6 +31,15 @@ def _current_info():
             "sqlite_exists": exists,
             "sqlite_size": size,
         })
+        # Report what the connection actually runs with, not just what was requested
+        try:
+            with engine.connect() as conn:
+                info["profile_settings"] = {
+                    name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                    for name in ("journal_mode", "synchronous", "cache_size", "mmap_size", "busy_timeout")
+                }
+        except Exception:
+            info["profile_settings"] = {k: v for k, v in profile.items() if k.startswith("sqlite_")}
     else:
         # For MySQL and others, show safe parts only
         info.update({
@@ -36,6 +48,13 @@ def _current_info():
             "database": getattr(url, "database", None),
             "username": getattr(url, "username", None),
         })
+        pool = engine.pool
+        info["profile_settings"] = {
+            "pool_size": pool.size() if hasattr(pool, "size") else None,
+            "max_overflow": getattr(pool, "_max_overflow", None),
+            "pool_recycle": getattr(pool, "_recycle", None),
+            "pool_pre_ping": getattr(pool, "_pre_ping", None),
+        }
 
     return info
 
@@ -88,6 +107,14 @@ def view_settings():
     info = _current_info()
     import os
     default_sqlite_path = os.path.join(current_app.instance_path, "ministore.sqlite3")
+    if request.method == "POST" and request.form.get("action") == "save_profile":
+        profile = request.form.get("db_profile", "").strip().lower()
+        if profile not in PROFILES:
+            flash("Unknown engine profile.")
+        else:
+            _save_env_vars({"DB_PROFILE": profile}, [])
+            flash(f"Saved engine profile '{profile}' to .env. Restart server to apply.")
+        return redirect(url_for("settings.view_settings"))
     if request.method == "POST":
         db_choice = request.form.get("db_choice", "sqlite")
         action = request.form.get("action", "save")
@@ -95,7 +122,7 @@ def view_settings():
             sqlite_path = request.form.get("sqlite_path", "").strip()
             if not sqlite_path:
                 flash("Please provide a valid SQLite path.")
-                return render_template("settings.html", info=info, active=db_choice, default_sqlite_path=default_sqlite_path)
+                return render_template("settings.html", info=info, active=db_choice, default_sqlite_path=default_sqlite_path, profiles=PROFILES)
             if action == "test":
                 # Test SQLite by ensuring directory exists and touching file
                 try:
@@ -108,7 +135,7 @@ def view_settings():
                     flash("SQLite connection OK.")
                 except Exception as e:
                     flash(f"SQLite connection failed: {e}")
-                return render_template("settings.html", info=info, active=db_choice, default_sqlite_path=default_sqlite_path)
+                return render_template("settings.html", info=info, active=db_choice, default_sqlite_path=default_sqlite_path, profiles=PROFILES)
             # Save: clear DATABASE_URL; set DB_DIALECT & SQLITE_PATH
             updates = {"DB_DIALECT": "sqlite", "SQLITE_PATH": sqlite_path}
             remove = ["DATABASE_URL", "MYSQL_HOST", "MYSQL_PORT", "MYSQL_USER", "MYSQL_PASSWORD", "MYSQL_DB"]
@@ -134,10 +161,10 @@ def view_settings():
                     flash("MySQL connection OK.")
                 except Exception as e:
                     flash(f"MySQL connection failed: {e}")
-                return render_template("settings.html", info=info, active=db_choice, default_sqlite_path=default_sqlite_path)
+                return render_template("settings.html", info=info, active=db_choice, default_sqlite_path=default_sqlite_path, profiles=PROFILES)
             updates = {"DATABASE_URL": database_url}
             remove = ["DB_DIALECT", "SQLITE_PATH"]
             _save_env_vars(updates, remove)
             flash("Saved MySQL settings to .env. Restart server to apply.")
             return redirect(url_for("settings.view_settings"))
-    return render_template("settings.html", info=info, default_sqlite_path=default_sqlite_path)
+    return render_template("settings.html", info=info, default_sqlite_path=default_sqlite_path, profiles=PROFILES)
@@ -1,4 +1,6 @@
-from flask import Blueprint, session, redirect, url_for
+from flask import Blueprint, redirect, url_for
+
+from ..sql_log import clear_stash
 
 
 bp = Blueprint("sql", __name__)
@@ -6,5 +8,6 @@ bp = Blueprint("sql", __name__)
 
 @bp.post("/clear")
 def clear_log():
-    session.pop("last_sql", None)
+    """Drop stashed write statements so the next page shows only its own SQL."""
+    clear_stash()
     return redirect(url_for("main.index"))
@@ -1,11 +1,17 @@
+import base64
 from datetime import datetime
 from decimal import Decimal
+from typing import Optional, Tuple
 
-from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from flask import Blueprint, flash, jsonify, redirect, render_template, request, session, url_for
+from sqlalchemy import and_, or_
 
+from ..cache import cached_transaction_row, cached_transaction_rows, invalidate_transaction
 from ..extensions import db
+from ..importer import FORMATS, detect_format, import_transactions
 from ..models import Transaction
-from ..utils import decrypt_decimal, decrypt_text, encrypt_date, encrypt_decimal, encrypt_text
+from ..rollups import apply_transaction
+from ..utils import encrypt_transaction_fields
 
 
 bp = Blueprint("transactions", __name__)
@@ -17,26 +23,77 @@ def _require_auth_redirect():
     return None
 
 
+PAGE_SIZES = (25, 50, 100, 250)
+DEFAULT_PAGE_SIZE = 50
+
+
+def _encode_cursor(t) -> str:
+    raw = f"{t.created_at.isoformat()}|{t.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(value: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    if not value:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode("utf-8")
+        ts, txn_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(ts), int(txn_id)
+    except Exception:
+        return None
+
+
+def _page(company_id: int, size: int, after=None, before=None):
+    """One page of transactions, newest first, by keyset over (created_at, id).
+
+    ``after`` moves to older rows, ``before`` to newer ones. Returns the page plus
+    whether older/newer rows exist beyond it.
+    """
+    query = Transaction.query.filter_by(company_id=company_id)
+    if before:
+        ts, txn_id = before
+        query = query.filter(
+            or_(Transaction.created_at > ts, and_(Transaction.created_at == ts, Transaction.id > txn_id))
+        ).order_by(Transaction.created_at.asc(), Transaction.id.asc())
+    else:
+        if after:
+            ts, txn_id = after
+            query = query.filter(
+                or_(Transaction.created_at < ts, and_(Transaction.created_at == ts, Transaction.id < txn_id))
+            )
+        query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+    txns = query.limit(size + 1).all()
+    more = len(txns) > size
+    txns = txns[:size]
+    if before:
+        txns.reverse()
+        return txns, True, more
+    return txns, more, after is not None
+
+
 @bp.route("/", methods=["GET"])  # /txn/
 def list_transactions():
     guard = _require_auth_redirect()
     if guard:
         return guard
     company_id = session["company_id"]
-    txns = Transaction.query.filter_by(company_id=company_id).order_by(Transaction.created_at.desc()).all()
-    items = []
-    for t in txns:
-        items.append(
-            {
-                "id": t.id,
-                "date": decrypt_text(t.date_enc),
-                "type": decrypt_text(t.type_enc),
-                "category": decrypt_text(t.category_enc),
-                "amount": decrypt_decimal(t.amount_enc),
-                "notes": decrypt_text(t.notes_enc) or "",
-            }
-        )
-    return render_template("transactions.html", items=items)
+    size = request.args.get("size", DEFAULT_PAGE_SIZE, type=int)
+    if size not in PAGE_SIZES:
+        size = DEFAULT_PAGE_SIZE
+    after = _decode_cursor(request.args.get("after"))
+    before = None if after else _decode_cursor(request.args.get("before"))
+    txns, has_older, has_newer = _page(company_id, size, after=after, before=before)
+    items = cached_transaction_rows(txns)
+    next_url = url_for("transactions.list_transactions", after=_encode_cursor(txns[-1]), size=size) if txns and has_older else None
+    prev_url = url_for("transactions.list_transactions", before=_encode_cursor(txns[0]), size=size) if txns and has_newer else None
+    return render_template(
+        "transactions.html",
+        items=items,
+        size=size,
+        page_sizes=PAGE_SIZES,
+        next_url=next_url,
+        prev_url=prev_url,
+    )
 
 
 @bp.route("/add", methods=["POST"])  # /txn/add
@@ -61,18 +118,43 @@ def add_transaction():
         return redirect(url_for("transactions.list_transactions"))
     txn = Transaction(
         company_id=company_id,
-        date_enc=encrypt_text(date_str),
-        type_enc=encrypt_text(t_type.lower()),
-        category_enc=encrypt_text(category),
-        amount_enc=encrypt_decimal(amt),
-        notes_enc=encrypt_text(notes or ""),
+        **encrypt_transaction_fields(date_str, t_type.lower(), category, amt, notes),
     )
     db.session.add(txn)
+    apply_transaction(company_id, {"date": date_str, "type": t_type.lower(), "category": category, "amount": amt})
     db.session.commit()
     flash("Transaction added.", "success")
     return redirect(url_for("transactions.list_transactions"))
 
 
+@bp.route("/import", methods=["POST"])  # /txn/import
+def import_file():
+    guard = _require_auth_redirect()
+    if guard:
+        return guard
+    company_id = session["company_id"]
+    upload = request.files.get("file")
+    wants_json = request.accept_mimetypes.best == "application/json"
+    if not upload or not upload.filename:
+        if wants_json:
+            return jsonify({"error": "No file uploaded."}), 400
+        flash("Choose a CSV or NDJSON file to import.", "danger")
+        return redirect(url_for("transactions.list_transactions"))
+    fmt = request.form.get("format") or detect_format(upload.filename)
+    if fmt not in FORMATS:
+        if wants_json:
+            return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+        flash("Unsupported import format.", "danger")
+        return redirect(url_for("transactions.list_transactions"))
+    result = import_transactions(company_id, upload.stream, fmt)
+    if wants_json:
+        return jsonify(result)
+    flash(f"Imported {result['imported']} transactions, {result['failed']} rows failed.", "success" if not result["failed"] else "warning")
+    for err in result["errors"][:10]:
+        flash(f"Line {err['line']}: {err['error']}", "danger")
+    return redirect(url_for("transactions.list_transactions"))
+
+
 @bp.route("/<int:txn_id>/delete", methods=["POST"])  # /txn/<id>/delete
 def delete_transaction(txn_id: int):
     guard = _require_auth_redirect()
@@ -83,6 +165,8 @@ def delete_transaction(txn_id: int):
     if not txn:
         flash("Not found.", "warning")
         return redirect(url_for("transactions.list_transactions"))
+    apply_transaction(company_id, cached_transaction_row(txn), sign=-1)
+    invalidate_transaction(txn)
     db.session.delete(txn)
     db.session.commit()
     flash("Deleted.", "info")
@@ -110,11 +194,11 @@ def edit_transaction(txn_id: int):
     except Exception:
         flash("Invalid date or amount.", "danger")
         return redirect(url_for("transactions.list_transactions"))
-    txn.date_enc = encrypt_text(date_str)
-    txn.type_enc = encrypt_text(t_type.lower())
-    txn.category_enc = encrypt_text(category)
-    txn.amount_enc = encrypt_decimal(amt)
-    txn.notes_enc = encrypt_text(notes or "")
+    apply_transaction(company_id, cached_transaction_row(txn), sign=-1)
+    apply_transaction(company_id, {"date": date_str, "type": t_type.lower(), "category": category, "amount": amt})
+    invalidate_transaction(txn)
+    for column, value in encrypt_transaction_fields(date_str, t_type.lower(), category, amt, notes).items():
+        setattr(txn, column, value)
     db.session.commit()
     flash("Updated.", "success")
     return redirect(url_for("transactions.list_transactions"))
@@ -0,0 +1,165 @@
+from datetime import date
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, literal, select
+
+from .extensions import db
+from .models import Customer, Product, Sale, SalesDailyRollup
+from .versions import STORE_SCOPE, mark_changed
+
+# Daily sales rollups: one row per day x product x customer (0 = walk-in), so
+# range totals and top-N queries scan at most days x active products rather
+# than every Sale. Buckets are upserted in the same transaction as the sales.
+# Deleting a customer leaves its buckets in place; customer rankings join
+# Customer, so they simply drop out while revenue totals stay correct.
+
+
+def _upsert(bucket: Dict[str, Any]) -> None:
+    table = SalesDailyRollup.__table__
+    dialect = db.session.get_bind().dialect.name
+    increments = ("quantity", "revenue", "sales_count")
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(**bucket)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "product_id", "customer_id"],
+            set_={k: table.c[k] + stmt.excluded[k] for k in increments},
+        )
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+
+        stmt = insert(table).values(**bucket)
+        stmt = stmt.on_duplicate_key_update({k: table.c[k] + stmt.inserted[k] for k in increments})
+    else:
+        result = db.session.execute(
+            table.update()
+            .where(
+                table.c.day == bucket["day"],
+                table.c.product_id == bucket["product_id"],
+                table.c.customer_id == bucket["customer_id"],
+            )
+            .values({k: table.c[k] + bucket[k] for k in increments})
+        )
+        if result.rowcount:
+            return
+        stmt = table.insert().values(**bucket)
+    db.session.execute(stmt)
+
+
+def apply_sales(rows: Iterable[Dict[str, Any]]) -> None:
+    """Add Sale column dicts (product_id, customer_id, quantity, total_price, sale_date) to their buckets.
+
+    Runs in the caller's session; commit together with the Sale inserts.
+    """
+    buckets: Dict[tuple, Dict[str, Any]] = {}
+    for r in rows:
+        key = (r["sale_date"], r["product_id"], r.get("customer_id") or 0)
+        bucket = buckets.setdefault(key, {
+            "day": key[0],
+            "product_id": key[1],
+            "customer_id": key[2],
+            "quantity": 0,
+            "revenue": Decimal("0"),
+            "sales_count": 0,
+        })
+        bucket["quantity"] += r["quantity"]
+        bucket["revenue"] += Decimal(str(r["total_price"]))
+        bucket["sales_count"] += 1
+    for key in sorted(buckets):
+        _upsert(buckets[key])
+
+
+def _in_range(query, start: Optional[date], end: Optional[date]):
+    if start:
+        query = query.where(SalesDailyRollup.day >= start)
+    if end:
+        query = query.where(SalesDailyRollup.day <= end)
+    return query
+
+
+def range_totals(start: Optional[date], end: Optional[date]) -> Dict[str, Any]:
+    """Revenue, number of sales and units sold between two dates (inclusive)."""
+    row = db.session.execute(
+        _in_range(
+            select(
+                func.sum(SalesDailyRollup.revenue),
+                func.sum(SalesDailyRollup.sales_count),
+                func.sum(SalesDailyRollup.quantity),
+            ),
+            start,
+            end,
+        )
+    ).one()
+    revenue, count, quantity = row
+    return {"revenue": float(revenue or 0), "count": int(count or 0), "quantity": int(quantity or 0)}
+
+
+def top_products(start: Optional[date], end: Optional[date], limit: int = 10) -> List[Dict[str, Any]]:
+    revenue = func.sum(SalesDailyRollup.revenue).label("revenue")
+    query = _in_range(
+        select(
+            SalesDailyRollup.product_id,
+            Product.name,
+            revenue,
+            func.sum(SalesDailyRollup.quantity).label("quantity"),
+        )
+        .join(Product, Product.id == SalesDailyRollup.product_id)
+        .group_by(SalesDailyRollup.product_id, Product.name)
+        .order_by(revenue.desc())
+        .limit(limit),
+        start,
+        end,
+    )
+    return [
+        {"product_id": pid, "name": name, "revenue": float(rev or 0), "quantity": int(qty or 0)}
+        for pid, name, rev, qty in db.session.execute(query)
+    ]
+
+
+def top_customers(start: Optional[date], end: Optional[date], limit: int = 10) -> List[Dict[str, Any]]:
+    revenue = func.sum(SalesDailyRollup.revenue).label("revenue")
+    query = _in_range(
+        select(
+            SalesDailyRollup.customer_id,
+            Customer.name,
+            revenue,
+            func.sum(SalesDailyRollup.sales_count).label("count"),
+        )
+        .join(Customer, Customer.id == SalesDailyRollup.customer_id)
+        .group_by(SalesDailyRollup.customer_id, Customer.name)
+        .order_by(revenue.desc())
+        .limit(limit),
+        start,
+        end,
+    )
+    return [
+        {"customer_id": cid, "name": name, "revenue": float(rev or 0), "count": int(n or 0)}
+        for cid, name, rev, n in db.session.execute(query)
+    ]
+
+
+def rebuild_sales_rollups() -> int:
+    """Recompute every bucket from the Sale table with one INSERT ... SELECT; returns bucket count."""
+    customer = func.coalesce(Sale.customer_id, literal(0))
+    source = select(
+        Sale.sale_date,
+        Sale.product_id,
+        customer,
+        func.sum(Sale.quantity),
+        func.sum(Sale.total_price),
+        func.count(Sale.id),
+    ).group_by(Sale.sale_date, Sale.product_id, customer)
+    table = SalesDailyRollup.__table__
+    mark_changed(STORE_SCOPE)
+    db.session.execute(table.delete())
+    db.session.execute(
+        table.insert().from_select(
+            ["day", "product_id", "customer_id", "quantity", "revenue", "sales_count"], source
+        )
+    )
+    db.session.commit()
+    return db.session.execute(select(func.count()).select_from(table)).scalar() or 0
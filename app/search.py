@@ -0,0 +1,91 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from flask import current_app
+from sqlalchemy import or_
+
+from .cache import LRUCache, on_reset, register_store_cache
+from .models import Customer, Product
+
+# Typeahead search over store products and customers. Matching is a
+# case-insensitive prefix on any of the listed columns, which the prefix
+# indexes declared in app.models serve. Results are cached per (kind, query);
+# when a shorter prefix already returned fewer than `limit` rows, that set is
+# complete, so a longer query is answered by filtering it in memory.
+
+_cache: Optional[LRUCache] = None
+
+
+def _get_cache() -> LRUCache:
+    global _cache
+    if _cache is None:
+        _cache = register_store_cache(
+            LRUCache(current_app.config.get("SEARCH_CACHE_SIZE", 2048), ttl=current_app.config.get("STORE_METRICS_TTL", 30))
+        )
+    return _cache
+
+
+@on_reset
+def _reset_cache() -> None:
+    global _cache
+    _cache = None
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _product_dict(p: Product) -> Dict[str, Any]:
+    return {"id": p.id, "name": p.name, "category": p.category, "price": str(p.price), "stock_qty": p.stock_qty}
+
+
+def _customer_dict(c: Customer) -> Dict[str, Any]:
+    return {"id": c.id, "name": c.name, "phone": c.phone, "email": c.email}
+
+
+_KINDS: Dict[str, tuple] = {
+    "products": (Product, (Product.name, Product.category), ("name", "category"), _product_dict),
+    "customers": (Customer, (Customer.name, Customer.phone, Customer.email), ("name", "phone", "email"), _customer_dict),
+}
+
+
+def _matches(row: Dict[str, Any], fields: Sequence[str], prefix: str) -> bool:
+    return any((row.get(f) or "").casefold().startswith(prefix) for f in fields)
+
+
+def _query(kind: str, prefix: str, limit: int) -> List[Dict[str, Any]]:
+    model, columns, _fields, to_dict = _KINDS[kind]
+    query = model.query
+    if prefix:
+        pattern = escape_like(prefix) + "%"
+        query = query.filter(or_(*[c.like(pattern, escape="\\") for c in columns]))
+    return [to_dict(obj) for obj in query.order_by(columns[0].asc(), model.id.asc()).limit(limit)]
+
+
+def search(kind: str, q: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Up to ``limit`` products or customers whose searchable fields start with ``q``."""
+    max_limit = current_app.config.get("SEARCH_MAX_RESULTS", 50)
+    limit = max(1, min(limit or current_app.config.get("SEARCH_RESULTS", 20), max_limit))
+    prefix = " ".join((q or "").split()).casefold()
+    cache = _get_cache()
+    key = (kind, prefix, limit)
+    rows = cache.get(key)
+    if rows is not None:
+        return rows
+    fields = _KINDS[kind][2]
+    for cut in range(len(prefix) - 1, -1, -1):
+        shorter = cache.get((kind, prefix[:cut], limit))
+        if shorter is not None and len(shorter) < limit:
+            rows = [r for r in shorter if _matches(r, fields, prefix)]
+            break
+    if rows is None:
+        rows = _query(kind, prefix, limit)
+    cache.set(key, rows)
+    return rows
+
+
+def search_products(q: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    return search("products", q, limit)
+
+
+def search_customers(q: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    return search("customers", q, limit)
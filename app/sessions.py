@@ -0,0 +1,256 @@
+import hashlib
+import json
+import os
+import secrets
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Optional, Tuple
+
+from flask import Flask
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from .extensions import db
+
+# Server-side sessions. The cookie holds only a random session id; the data
+# lives in the server_session table (SESSION_BACKEND=db) or one file per
+# session (SESSION_BACKEND=file), keyed by a hash of the id so a copy of the
+# store doesn't expose live cookies. A session is written only when its data
+# changed, or when it is past half its lifetime (to extend expiry); expired
+# entries are swept periodically and by `flask sweep-sessions`.
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial: Optional[dict] = None, sid: Optional[str] = None, expires_at: Optional[datetime] = None):
+        def on_update(self):
+            self.modified = True
+            self.accessed = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.expires_at = expires_at
+        self.modified = False
+        self.accessed = False
+        self.regenerate = False
+
+    def clear(self) -> None:
+        # Views clear the session when its privileges change (login, OTP
+        # verification); a fresh id keeps a planted cookie from riding along
+        super().clear()
+        self.regenerate = True
+
+    def __getitem__(self, key):
+        self.accessed = True
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.accessed = True
+        return super().get(key, default)
+
+    def setdefault(self, key, default=None):
+        self.accessed = True
+        return super().setdefault(key, default)
+
+
+def _store_key(sid: str) -> str:
+    return hashlib.sha256(sid.encode("utf-8")).hexdigest()
+
+
+class DatabaseSessionStore:
+    """Sessions in the server_session table, via the app's engine (outside the request's db.session)."""
+
+    def load(self, key: str) -> Optional[Tuple[bytes, datetime]]:
+        from .models import ServerSession
+
+        table = ServerSession.__table__
+        with db.engine.connect() as conn:
+            row = conn.execute(
+                table.select().with_only_columns(table.c.data, table.c.expires_at).where(table.c.id == key)
+            ).first()
+        return (row[0], row[1]) if row else None
+
+    def save(self, key: str, data: bytes, expires_at: datetime) -> None:
+        from .models import ServerSession
+
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            updated = conn.execute(
+                table.update().where(table.c.id == key).values(data=data, expires_at=expires_at)
+            ).rowcount
+            if not updated:
+                conn.execute(table.insert().values(id=key, data=data, expires_at=expires_at))
+
+    def delete(self, key: str) -> None:
+        from .models import ServerSession
+
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.id == key))
+
+    def sweep(self, now: datetime) -> int:
+        from .models import ServerSession
+
+        table = ServerSession.__table__
+        with db.engine.begin() as conn:
+            return conn.execute(table.delete().where(table.c.expires_at < now)).rowcount or 0
+
+
+class FileSessionStore:
+    """One JSON file per session under ``directory``."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.session")
+
+    def load(self, key: str) -> Optional[Tuple[bytes, datetime]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                record = json.load(f)
+            return record["data"].encode("utf-8"), datetime.fromisoformat(record["expires_at"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, key: str, data: bytes, expires_at: datetime) -> None:
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"data": data.decode("utf-8"), "expires_at": expires_at.isoformat()}, f)
+        os.replace(tmp, path)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def sweep(self, now: datetime) -> int:
+        removed = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(".session"):
+                continue
+            loaded = self.load(name[: -len(".session")])
+            if loaded is None or loaded[1] < now:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+class ServerSideSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store, sweep_interval: int = 3600):
+        self.store = store
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+        self._sweep_lock = threading.Lock()
+
+    def _lifetime(self, app: Flask) -> timedelta:
+        return app.permanent_session_lifetime
+
+    def open_session(self, app: Flask, request) -> ServerSideSession:
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and len(sid) <= 128:
+            loaded = self.store.load(_store_key(sid))
+            if loaded is not None:
+                raw, expires_at = loaded
+                if expires_at >= datetime.utcnow():
+                    try:
+                        data = self.serializer.loads(raw.decode("utf-8"))
+                    except ValueError:
+                        data = {}
+                    return ServerSideSession(data, sid=sid, expires_at=expires_at)
+        return ServerSideSession()
+
+    def save_session(self, app: Flask, session: ServerSideSession, response) -> None:
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        secure = self.get_cookie_secure(app)
+        partitioned = self.get_cookie_partitioned(app)
+        samesite = self.get_cookie_samesite(app)
+        httponly = self.get_cookie_httponly(app)
+
+        if session.accessed:
+            response.vary.add("Cookie")
+
+        if not session:
+            if session.modified and session.sid:
+                self.store.delete(_store_key(session.sid))
+                response.delete_cookie(
+                    name, domain=domain, path=path, secure=secure, partitioned=partitioned,
+                    samesite=samesite, httponly=httponly,
+                )
+            return
+
+        now = datetime.utcnow()
+        lifetime = self._lifetime(app)
+        # Extend sessions still in use once they are past half their lifetime
+        stale = session.expires_at is not None and session.expires_at - now < lifetime / 2
+        if not (session.modified or session.sid is None or stale):
+            return
+
+        if session.regenerate and session.sid:
+            self.store.delete(_store_key(session.sid))
+            session.sid = None
+        new_sid = session.sid is None
+        if new_sid:
+            session.sid = secrets.token_urlsafe(32)
+        expires_at = now + lifetime
+        self.store.save(_store_key(session.sid), self.serializer.dumps(dict(session)).encode("utf-8"), expires_at)
+        session.expires_at = expires_at
+        self._maybe_sweep(now)
+
+        if new_sid or session.permanent:
+            response.set_cookie(
+                name,
+                session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=httponly,
+                domain=domain,
+                path=path,
+                secure=secure,
+                partitioned=partitioned,
+                samesite=samesite,
+            )
+
+    def _maybe_sweep(self, now: datetime) -> None:
+        if not self.sweep_interval or time.monotonic() - self._last_sweep < self.sweep_interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = time.monotonic()
+            self.store.sweep(now)
+        except Exception:  # noqa: BLE001 - sweeping is best effort
+            pass
+        finally:
+            self._sweep_lock.release()
+
+
+def init_sessions(app: Flask) -> None:
+    """Install the SESSION_BACKEND session interface ("cookie" keeps Flask's signed cookie)."""
+    backend = (app.config.get("SESSION_BACKEND") or "db").lower()
+    if backend == "cookie":
+        return
+    if backend == "file":
+        store: Any = FileSessionStore(app.config.get("SESSION_FILE_DIR") or os.path.join(app.instance_path, "sessions"))
+    else:
+        if backend != "db":
+            print(f"[WARN] Unknown SESSION_BACKEND '{backend}'; using 'db'.")
+        store = DatabaseSessionStore()
+    app.session_interface = ServerSideSessionInterface(store, app.config.get("SESSION_SWEEP_INTERVAL", 3600))
+
+
+def sweep_sessions(app: Flask) -> int:
+    interface = app.session_interface
+    if not isinstance(interface, ServerSideSessionInterface):
+        return 0
+    return interface.store.sweep(datetime.utcnow())
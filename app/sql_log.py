@@ -0,0 +1,197 @@
+import re
+import time
+from collections import deque
+from datetime import date, datetime
+
+from flask import g, has_request_context, session
+from sqlalchemy import event
+
+# Per-request SQL instrumentation. Every request gets a bounded ring buffer of
+# raw (statement, parameters) pairs plus a query count and cumulative DB time;
+# statements are only rendered when a template actually shows the SQL panel,
+# and the totals are reported in a Server-Timing response header. When a
+# request answers with a redirect (the usual POST/redirect/GET), its write
+# statements are stashed in the session, flash-style, and shown once by the
+# page the redirect lands on.
+
+
+def _fmt_value(v):
+    if v is None:
+        return "NULL"
+    if isinstance(v, (int, float)):
+        return str(v)
+    if isinstance(v, (date, datetime)):
+        return f"'{v.isoformat()}'"
+    if isinstance(v, bool):
+        return '1' if v else '0'
+    if isinstance(v, (bytes, bytearray, memoryview)):
+        return f"'<{len(v)} bytes>'"
+    # Escape single quotes for SQL display
+    s = str(v).replace("'", "''")
+    return f"'{s}'"
+
+
+def render_sql(stmt: str, params) -> str:
+    s = str(stmt)
+    try:
+        # Dict param styles: %(name)s or :name
+        if isinstance(params, dict) and params:
+            # pyformat: %(name)s
+            def repl_pyformat(m):
+                key = m.group(1)
+                return _fmt_value(params.get(key))
+            s_py = re.sub(r"%\((\w+)\)s", repl_pyformat, s)
+            # named: :name
+            def repl_named(m):
+                key = m.group(1)
+                return _fmt_value(params.get(key))
+            s_named = re.sub(r":(\w+)", repl_named, s_py)
+            return s_named
+
+        # Positional param styles: ? or %s
+        if isinstance(params, (list, tuple)) and params:
+            vals = list(params)
+            # First try qmark '?'
+            if '?' in s:
+                out = []
+                it = iter(vals)
+                for ch in s:
+                    if ch == '?':
+                        try:
+                            out.append(_fmt_value(next(it)))
+                        except StopIteration:
+                            out.append('?')
+                    else:
+                        out.append(ch)
+                return ''.join(out)
+            # Then try %s tokens
+            def repl_s(_m, it=iter(vals)):
+                try:
+                    return _fmt_value(next(it))
+                except StopIteration:
+                    return '%s'
+            s = re.sub(r"%s", repl_s, s)
+            return s
+    except Exception:
+        return s
+    return s
+
+
+class RecentSQL:
+    """Most recent statement of the current request, rendered on first use."""
+
+    def __init__(self, log):
+        self._log = log
+        self._text = None
+
+    def __bool__(self):
+        return bool(self._log)
+
+    def __str__(self):
+        if self._text is None:
+            self._text = ""
+            if self._log:
+                stmt, params = self._log[-1]
+                self._text = render_sql(stmt, params).strip()
+        return self._text
+
+
+_STASH_KEY = "_sql_writes"
+_STASH_MAX_CHARS = 2000
+_WRITE_VERBS = ("INSERT", "UPDATE", "DELETE")
+# Bookkeeping writes every commit makes; not what the user did
+_SKIP_TABLES = ("data_version",)
+
+
+def _is_user_write(stmt: str) -> bool:
+    head = stmt.lstrip()[:6].upper()
+    return head in _WRITE_VERBS and not any(t in stmt for t in _SKIP_TABLES)
+
+
+def stash_writes(log) -> None:
+    """Keep the request's write statements for the page its redirect lands on."""
+    writes = [render_sql(stmt, params).strip() for stmt, params in log if _is_user_write(stmt)]
+    if writes:
+        text = ";\n".join(writes)
+        if len(text) > _STASH_MAX_CHARS:
+            text = "...\n" + text[-_STASH_MAX_CHARS:]
+        session[_STASH_KEY] = text
+
+
+def clear_stash() -> None:
+    if _STASH_KEY in session:
+        session.pop(_STASH_KEY)
+
+
+class CarriedSQL:
+    """Write statements stashed by the request that redirected here; consumed when first shown."""
+
+    def __init__(self):
+        self._text = None
+
+    def _load(self) -> str:
+        if self._text is None:
+            self._text = session.pop(_STASH_KEY, "") if _STASH_KEY in session else ""
+        return self._text
+
+    def __bool__(self):
+        return bool(self._load())
+
+    def __str__(self):
+        return self._load()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+    conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ANN001
+    started = conn.info.get("_query_start")
+    elapsed = time.perf_counter() - started.pop() if started else 0.0
+    if not has_request_context():
+        return
+    stats = g.get("_sql_stats")
+    if stats is None:
+        return
+    stats["count"] += 1
+    stats["time"] += elapsed
+    log = g.get("_sql_log")
+    if log is not None:
+        log.append((statement, parameters))
+
+
+def init_sql_log(app, engine) -> None:
+    """Attach engine listeners and request hooks; SQL_LOG_SIZE=0 keeps only count/timing."""
+    if not app.config.get("_SQL_LISTENER_SET"):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        app.config["_SQL_LISTENER_SET"] = True
+
+    log_size = app.config.get("SQL_LOG_SIZE", 50)
+
+    @app.before_request
+    def _sql_log_init():
+        g._sql_stats = {"count": 0, "time": 0.0, "start": time.perf_counter()}
+        g._sql_log = deque(maxlen=log_size) if log_size else None
+
+    @app.after_request
+    def _sql_stash_writes(response):
+        log = g.get("_sql_log")
+        if log and response.status_code in (301, 302, 303, 307, 308):
+            stash_writes(log)
+        return response
+
+    @app.after_request
+    def _sql_server_timing(response):
+        stats = g.get("_sql_stats")
+        if stats and app.config.get("SQL_SERVER_TIMING", True):
+            total_ms = (time.perf_counter() - stats["start"]) * 1000
+            response.headers.add(
+                "Server-Timing",
+                f'db;dur={stats["time"] * 1000:.2f};desc="{stats["count"]} queries", app;dur={total_ms:.2f}',
+            )
+        return response
+
+    @app.context_processor
+    def inject_sql_log():
+        return {"sql_recent": RecentSQL(g.get("_sql_log") or ()), "sql_carried": CarriedSQL()}
@@ -1,8 +1,14 @@
 import base64
+import hashlib
+import hmac
 import os
+import struct
+import threading
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from decimal import Decimal
-from typing import Optional, Tuple
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import requests
 from cryptography.fernet import Fernet, InvalidToken
@@ -10,24 +16,41 @@ from flask import current_app
 from werkzeug.security import check_password_hash, generate_password_hash
 
 
-def _ensure_fernet() -> Fernet:
-    key = current_app.config.get("ENCRYPTION_KEY")
-    if not key:
-        # In production, enforce key presence
-        raise RuntimeError("ENCRYPTION_KEY is not set. Provide a urlsafe base64 32-byte key.")
+@lru_cache(maxsize=8)
+def _normalize_key(key: str) -> bytes:
     # If a raw 32-byte is provided, base64-url encode it; otherwise assume already encoded
     try:
         # Validate by trying to construct
-        return Fernet(key)
+        Fernet(key)
+        return key.encode("utf-8")
     except Exception:
         # Attempt encoding raw
         try:
             encoded = base64.urlsafe_b64encode(key.encode("utf-8"))
-            return Fernet(encoded)
+            Fernet(encoded)
+            return encoded
         except Exception as e:
             raise RuntimeError("Invalid ENCRYPTION_KEY; expected urlsafe base64 32-byte.") from e
 
 
+@lru_cache(maxsize=8)
+def _fernet_for(key: bytes) -> Fernet:
+    return Fernet(key)
+
+
+def _encryption_key() -> bytes:
+    key = current_app.config.get("ENCRYPTION_KEY")
+    if not key:
+        # In production, enforce key presence
+        raise RuntimeError("ENCRYPTION_KEY is not set. Provide a urlsafe base64 32-byte key.")
+    return _normalize_key(key)
+
+
+def _ensure_fernet() -> Fernet:
+    # One Fernet per key for the life of the process; constructing it re-parses the key
+    return _fernet_for(_encryption_key())
+
+
 def hash_password(password: str) -> str:
     return generate_password_hash(password)
 
@@ -53,6 +76,90 @@ def decrypt_text(value: Optional[bytes]) -> Optional[str]:
         return None
 
 
+_pool_lock = threading.Lock()
+_thread_pool: Optional[ThreadPoolExecutor] = None
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _decrypt_chunk(key: bytes, tokens: Sequence[Optional[bytes]]) -> List[Optional[bytes]]:
+    # Module-level so it can run in a process pool worker
+    f = _fernet_for(key)
+    out: List[Optional[bytes]] = []
+    for token in tokens:
+        if not token:
+            out.append(None)
+            continue
+        try:
+            out.append(f.decrypt(token))
+        except InvalidToken:
+            out.append(None)
+    return out
+
+
+def _get_pool(kind: str):
+    global _thread_pool, _process_pool
+    workers = current_app.config.get("DECRYPT_WORKERS") or os.cpu_count() or 1
+    with _pool_lock:
+        if kind == "process":
+            if _process_pool is None:
+                _process_pool = ProcessPoolExecutor(max_workers=workers)
+            return _process_pool
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decrypt")
+        return _thread_pool
+
+
+def _encrypt_chunk(key: bytes, payloads: Sequence[bytes]) -> List[bytes]:
+    f = _fernet_for(key)
+    return [f.encrypt(p) for p in payloads]
+
+
+def _map_chunks(fn, items: Sequence[Any]) -> List[Any]:
+    """Run ``fn(key, chunk)`` over ``items`` inline or across a pool, keeping order.
+
+    Thresholds come from DECRYPT_PARALLEL_MIN / DECRYPT_PROCESS_MIN, which apply
+    to encryption batches as well.
+    """
+    key = _encryption_key()
+    cfg = current_app.config
+    n = len(items)
+    workers = cfg.get("DECRYPT_WORKERS") or os.cpu_count() or 1
+    process_min = cfg.get("DECRYPT_PROCESS_MIN", 0)
+    if process_min and n >= process_min and workers > 1:
+        kind = "process"
+    elif n >= cfg.get("DECRYPT_PARALLEL_MIN", 512) and workers > 1:
+        kind = "thread"
+    else:
+        return fn(key, items)
+    size = -(-n // workers)
+    chunks = [items[i:i + size] for i in range(0, n, size)]
+    pool = _get_pool(kind)
+    out: List[Any] = []
+    for part in pool.map(fn, [key] * len(chunks), chunks):
+        out.extend(part)
+    return out
+
+
+def _decrypt_many_raw(tokens: Sequence[Optional[bytes]]) -> List[Optional[bytes]]:
+    return _map_chunks(_decrypt_chunk, tokens)
+
+
+def encrypt_many(payloads: Sequence[bytes]) -> List[bytes]:
+    """Encrypt a batch of byte strings with one cached cipher, in input order."""
+    return _map_chunks(_encrypt_chunk, payloads)
+
+
+def decrypt_many(tokens: Sequence[Optional[bytes]]) -> List[Optional[str]]:
+    """Decrypt a batch of text tokens with one cached cipher, in input order.
+
+    Small batches run inline; batches of at least DECRYPT_PARALLEL_MIN tokens are
+    split across a thread pool, and batches of at least DECRYPT_PROCESS_MIN
+    (0 disables) across a process pool for very large exports. Tokens that are
+    empty or fail to decrypt yield None, like ``decrypt_text``.
+    """
+    return [None if raw is None else raw.decode("utf-8") for raw in _decrypt_many_raw(tokens)]
+
+
 def encrypt_decimal(value: Decimal) -> bytes:
     return encrypt_text(str(value))  # type: ignore[return-value]
 
@@ -71,19 +178,253 @@ def decrypt_date(value: bytes) -> datetime:
     return datetime.fromisoformat((s or "1970-01-01"))
 
 
+def _blind_index_key() -> bytes:
+    key = current_app.config.get("BLIND_INDEX_KEY")
+    if key:
+        return key.encode("utf-8")
+    master = current_app.config.get("ENCRYPTION_KEY")
+    if not master:
+        raise RuntimeError("ENCRYPTION_KEY is not set. Provide a urlsafe base64 32-byte key.")
+    # Separate key from the Fernet key so index values reveal nothing about it
+    return hmac.new(master.encode("utf-8"), b"transaction-blind-index", hashlib.sha256).digest()
+
+
+def normalize_category(category: Optional[str]) -> str:
+    return " ".join((category or "").split()).lower()
+
+
+def blind_index(kind: str, value: str) -> str:
+    """Deterministic keyed digest of ``value``, usable in SQL equality/IN filters."""
+    mac = hmac.new(_blind_index_key(), f"{kind}:{value}".encode("utf-8"), hashlib.sha256)
+    return mac.hexdigest()[:32]
+
+
+def transaction_blind_indexes(date_str: str, t_type: str, category: str) -> Dict[str, str]:
+    return {
+        "month_bidx": blind_index("month", (date_str or "")[:7]),
+        "type_bidx": blind_index("type", (t_type or "").lower()),
+        "category_bidx": blind_index("category", normalize_category(category)),
+    }
+
+
+# Packed record layout (before encryption):
+#   version byte, then each field as a big-endian length prefix + UTF-8 bytes
+#   (date, type, category, amount, notes). Version 1 used >H prefixes for the
+#   first four fields, which capped them at 65535 bytes; version 2 uses >I
+#   throughout. Both are read.
+PACKED_RECORD_VERSION = 2
+_PACKED_LEN_FORMATS = {
+    1: (">H", ">H", ">H", ">H", ">I"),
+    2: (">I", ">I", ">I", ">I", ">I"),
+}
+
+
+def pack_record(values: Tuple[str, ...]) -> bytes:
+    out = [bytes([PACKED_RECORD_VERSION])]
+    for fmt, value in zip(_PACKED_LEN_FORMATS[PACKED_RECORD_VERSION], values):
+        raw = (value or "").encode("utf-8")
+        out.append(struct.pack(fmt, len(raw)))
+        out.append(raw)
+    return b"".join(out)
+
+
+def unpack_record(data: bytes) -> Tuple[str, ...]:
+    formats = _PACKED_LEN_FORMATS.get(data[0]) if data else None
+    if formats is None:
+        raise ValueError("Unsupported packed record version")
+    pos = 1
+    values = []
+    for fmt in formats:
+        (length,) = struct.unpack_from(fmt, data, pos)
+        pos += struct.calcsize(fmt)
+        values.append(data[pos:pos + length].decode("utf-8"))
+        pos += length
+    return tuple(values)
+
+
+def encrypt_record(values: Tuple[str, ...]) -> bytes:
+    return _ensure_fernet().encrypt(pack_record(values))
+
+
+def decrypt_record(token: bytes) -> Optional[Tuple[str, ...]]:
+    try:
+        return unpack_record(_ensure_fernet().decrypt(token))
+    except (InvalidToken, ValueError, struct.error):
+        return None
+
+
+def encrypt_transaction_fields(
+    date_str: str,
+    t_type: str,
+    category: str,
+    amount: Decimal,
+    notes: Optional[str],
+    packed: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """Column values for a Transaction, in packed or per-field format (TXN_PACKED_RECORDS by default).
+
+    Blind index columns are always included.
+    """
+    if packed is None:
+        packed = current_app.config.get("TXN_PACKED_RECORDS", True)
+    columns = transaction_blind_indexes(date_str, t_type, category)
+    if packed:
+        columns.update({
+            "record_enc": encrypt_record((date_str, t_type, category, str(amount), notes or "")),
+            "date_enc": b"",
+            "type_enc": b"",
+            "category_enc": b"",
+            "amount_enc": b"",
+            "notes_enc": None,
+        })
+    else:
+        columns.update({
+            "record_enc": None,
+            "date_enc": encrypt_text(date_str),
+            "type_enc": encrypt_text(t_type),
+            "category_enc": encrypt_text(category),
+            "amount_enc": encrypt_decimal(amount),
+            "notes_enc": encrypt_text(notes or ""),
+        })
+    return columns
+
+
+def encrypt_transaction_rows(rows: Sequence[Dict[str, Any]], packed: Optional[bool] = None) -> List[Dict[str, Any]]:
+    """``encrypt_transaction_fields`` for many rows (keys date/type/category/amount/notes).
+
+    Packed records are encrypted as one batch via ``encrypt_many``.
+    """
+    if packed is None:
+        packed = current_app.config.get("TXN_PACKED_RECORDS", True)
+    if not packed:
+        return [
+            encrypt_transaction_fields(r["date"], r["type"], r["category"], r["amount"], r.get("notes"), packed=False)
+            for r in rows
+        ]
+    tokens = encrypt_many([
+        pack_record((r["date"], r["type"], r["category"], str(r["amount"]), r.get("notes") or "")) for r in rows
+    ])
+    out = []
+    for r, token in zip(rows, tokens):
+        columns = transaction_blind_indexes(r["date"], r["type"], r["category"])
+        columns.update({
+            "record_enc": token,
+            "date_enc": b"",
+            "type_enc": b"",
+            "category_enc": b"",
+            "amount_enc": b"",
+            "notes_enc": None,
+        })
+        out.append(columns)
+    return out
+
+
+def _packed_row(t, values: Optional[Tuple[str, ...]]) -> Dict[str, Any]:
+    date_str, t_type, category, amount, notes = values or ("", "", "", "0", "")
+    return {
+        "id": t.id,
+        "date": date_str,
+        "type": t_type.lower(),
+        "category": category,
+        "amount": Decimal(amount or "0"),
+        "notes": notes,
+    }
+
+
+def _legacy_row(t, values: Sequence[Optional[str]]) -> Dict[str, Any]:
+    date_str, t_type, category, amount, notes = values
+    return {
+        "id": t.id,
+        "date": date_str or "",
+        "type": (t_type or "").lower(),
+        "category": category or "",
+        "amount": Decimal(amount or "0"),
+        "notes": notes or "",
+    }
+
+
+def decrypt_transactions(txns: Sequence[Any]) -> List[Dict[str, Any]]:
+    """Batch form of ``decrypt_transaction``; all tokens go through one ``decrypt_many`` pass."""
+    tokens: List[Optional[bytes]] = []
+    for t in txns:
+        if t.record_enc is not None:
+            tokens.append(t.record_enc)
+        else:
+            tokens.extend((t.date_enc, t.type_enc, t.category_enc, t.amount_enc, t.notes_enc))
+    plain = iter(_decrypt_many_raw(tokens))
+    rows = []
+    for t in txns:
+        if t.record_enc is not None:
+            raw = next(plain)
+            try:
+                values = unpack_record(raw) if raw is not None else None
+            except (ValueError, struct.error):
+                values = None
+            rows.append(_packed_row(t, values))
+        else:
+            values = [next(plain) for _ in range(5)]
+            rows.append(_legacy_row(t, [None if v is None else v.decode("utf-8") for v in values]))
+    return rows
+
+
+def decrypt_transaction(t) -> Dict[str, Any]:
+    """Decrypt every field of a Transaction row (packed or per-field) into a plain dict."""
+    if t.record_enc is not None:
+        return _packed_row(t, decrypt_record(t.record_enc))
+    return _legacy_row(
+        t,
+        [decrypt_text(v) for v in (t.date_enc, t.type_enc, t.category_enc, t.amount_enc, t.notes_enc)],
+    )
+
+
 def generate_otp() -> str:
     return f"{int.from_bytes(os.urandom(3), 'big') % 1000000:06d}"
 
 
+# OTPs are short-lived and attempt-limited, so a keyed HMAC (the key never
+# leaves the server) protects them without a password-grade KDF per login.
+OTP_HASH_SCHEME = "hmac-sha256"
+
+
+def _otp_key() -> bytes:
+    key = current_app.config.get("OTP_HMAC_KEY")
+    if key:
+        return key.encode("utf-8")
+    master = current_app.config.get("ENCRYPTION_KEY")
+    if not master:
+        raise RuntimeError("Neither OTP_HMAC_KEY nor ENCRYPTION_KEY is set; OTP hashing needs one of them.")
+    # Separate key from the Fernet key, as for blind indexes
+    return hmac.new(master.encode("utf-8"), b"otp-hmac", hashlib.sha256).digest()
+
+
+def _otp_mac(salt: str, code: str) -> str:
+    return hmac.new(_otp_key(), f"{salt}${code}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
 def hash_otp(code: str) -> str:
-    return generate_password_hash(code)
+    """``hmac-sha256$<salt>$<mac>`` with a random per-OTP salt."""
+    salt = os.urandom(16).hex()
+    return f"{OTP_HASH_SCHEME}${salt}${_otp_mac(salt, code)}"
 
 
 def verify_otp_hash(code_hash: str, code: str) -> bool:
+    if code_hash.startswith(OTP_HASH_SCHEME + "$"):
+        try:
+            _scheme, salt, mac = code_hash.split("$", 2)
+        except ValueError:
+            return False
+        return hmac.compare_digest(mac, _otp_mac(salt, code))
+    # OTPs issued before the HMAC scheme used Werkzeug password hashes
     return check_password_hash(code_hash, code)
 
 
-def send_email_otp_emailjs(to_email: str, company_name: str, otp_code: str) -> Tuple[bool, Optional[str]]:
+def send_email_otp_emailjs(
+    to_email: str,
+    company_name: str,
+    otp_code: str,
+    http: Optional[requests.Session] = None,
+) -> Tuple[bool, Optional[str]]:
+    """Deliver one email through EmailJS; pass ``http`` to reuse a pooled session."""
     service_id = current_app.config.get("EMAILJS_SERVICE_ID")
     template_id = current_app.config.get("EMAILJS_TEMPLATE_ID")
     public_key = current_app.config.get("EMAILJS_PUBLIC_KEY")
@@ -127,7 +468,11 @@ def send_email_otp_emailjs(to_email: str, company_name: str, otp_code: str) -> T
     }
 
     try:
-        resp = requests.post("https://api.emailjs.com/api/v1.0/email/send", json=payload, timeout=20)
+        resp = (http or requests).post(
+            current_app.config.get("EMAILJS_API_URL", "https://api.emailjs.com/api/v1.0/email/send"),
+            json=payload,
+            timeout=current_app.config.get("EMAILJS_TIMEOUT", 20),
+        )
         if resp.status_code in (200, 202):
             return True, None
         # Attempt to extract message
@@ -0,0 +1,212 @@
+import hashlib
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import Response, current_app, make_response, request, session
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from .cache import LRUCache, invalidate_store_caches
+from .extensions import db
+from .models import DataVersion
+
+# Data versions: a counter per scope ("company:<id>" for a company's
+# transactions, "store" for products/customers/sales), bumped inside the same
+# commit as the write. Pages derived only from one scope can then answer
+# conditional requests with 304 and reuse rendered bodies keyed by version,
+# across workers, without looking at the data itself.
+
+STORE_SCOPE = "store"
+_STORE_MODELS = ("Product", "Customer", "Sale")
+_COMPANY_MODELS = ("Transaction",)
+
+
+def company_scope(company_id: int) -> str:
+    return f"company:{company_id}"
+
+
+def _mark(session_: Session, scope: str) -> None:
+    session_.info.setdefault("dirty_scopes", set()).add(scope)
+
+
+def mark_changed(scope: str) -> None:
+    """Bump ``scope`` when db.session next commits, for writes the hooks can't attribute (Core statements, derived tables)."""
+    _mark(db.session(), scope)
+
+
+def _mark_object(session_: Session, obj) -> None:
+    name = type(obj).__name__
+    if name in _STORE_MODELS:
+        _mark(session_, STORE_SCOPE)
+    elif name in _COMPANY_MODELS and getattr(obj, "company_id", None):
+        _mark(session_, company_scope(obj.company_id))
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session_, _flush_context):
+    for obj in list(session_.new) + list(session_.dirty) + list(session_.deleted):
+        _mark_object(session_, obj)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_execute(state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush
+    if not (state.is_insert or state.is_update or state.is_delete) or state.bind_mapper is None:
+        return
+    name = state.bind_mapper.class_.__name__
+    if name in _STORE_MODELS:
+        _mark(state.session, STORE_SCOPE)
+    elif name in _COMPANY_MODELS:
+        params = state.parameters
+        rows = params if isinstance(params, list) else [params or {}]
+        for row in rows:
+            if row.get("company_id"):
+                _mark(state.session, company_scope(row["company_id"]))
+
+
+def _bump(session_: Session, scope: str, now: datetime) -> None:
+    table = DataVersion.__table__
+    update = (
+        table.update()
+        .where(table.c.scope == scope)
+        .values(version=table.c.version + 1, updated_at=now)
+    )
+    if session_.execute(update).rowcount:
+        return
+    dialect = session_.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+
+        stmt = insert(table).values(scope=scope, version=0, updated_at=now).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+
+        stmt = insert(table).values(scope=scope, version=0, updated_at=now).on_conflict_do_nothing()
+    else:
+        stmt = table.insert().prefix_with("IGNORE").values(scope=scope, version=0, updated_at=now)
+    session_.execute(stmt)
+    session_.execute(update)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_on_commit(session_):
+    # Flush first so pending ORM changes are seen by _mark_flush
+    session_.flush()
+    scopes = session_.info.get("dirty_scopes")
+    if not scopes:
+        return
+    now = datetime.utcnow().replace(microsecond=0)
+    for scope in sorted(scopes):
+        _bump(session_, scope, now)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session_):
+    scopes = session_.info.pop("dirty_scopes", None) or ()
+    if STORE_SCOPE in scopes:
+        invalidate_store_caches()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session_):
+    session_.info.pop("dirty_scopes", None)
+
+
+def current_versions(scopes: Sequence[str]) -> Dict[str, Tuple[int, Optional[datetime]]]:
+    """(version, updated_at) per scope; scopes never written are (0, None)."""
+    found = {
+        scope: (version, updated_at)
+        for scope, version, updated_at in db.session.execute(
+            select(DataVersion.scope, DataVersion.version, DataVersion.updated_at).where(DataVersion.scope.in_(scopes))
+        )
+    }
+    return {scope: found.get(scope, (0, None)) for scope in scopes}
+
+
+def data_version(scope: str) -> int:
+    return current_versions([scope])[scope][0]
+
+
+# Rendered bodies keyed by ETag. Versions change on every write, so entries
+# never go stale; the TTL covers output that depends on more than the data
+# (settings, templates after a deploy).
+_body_cache: Optional[LRUCache] = None
+
+
+def _get_body_cache() -> LRUCache:
+    global _body_cache
+    if _body_cache is None:
+        _body_cache = LRUCache(
+            current_app.config.get("RESPONSE_CACHE_SIZE", 256),
+            ttl=current_app.config.get("RESPONSE_CACHE_TTL", 300),
+        )
+    return _body_cache
+
+
+def reset_response_cache() -> None:
+    global _body_cache
+    _body_cache = None
+
+
+def _etag(scopes: Dict[str, Tuple[int, Optional[datetime]]], vary: Iterable[str]) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    # The database URL and each scope's updated_at keep tags distinct when a
+    # database is swapped or recreated and its counters restart
+    parts: List[str] = [db.engine.url.render_as_string(hide_password=True)]
+    parts += [request.endpoint or "", str(session.get("company_id") or "")]
+    parts += [f"{k}={v}" for k, v in sorted(request.args.items(multi=True))]
+    parts += [
+        f"{scope}@{version}@{updated_at.isoformat() if updated_at else ''}"
+        for scope, (version, updated_at) in sorted(scopes.items())
+    ]
+    parts += list(vary)
+    h.update("\x1f".join(parts).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _not_modified(etag: str, last_modified: Optional[datetime]) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    ims = request.if_modified_since
+    # HTTP dates carry whole seconds, so compare at that precision
+    return bool(ims and last_modified and last_modified.replace(microsecond=0) <= ims.replace(tzinfo=None))
+
+
+def versioned_response(
+    scopes: Sequence[str],
+    build: Callable[[], object],
+    cache_body: bool = True,
+    vary: Iterable[str] = (),
+) -> Response:
+    """Serve ``build()`` with an ETag/Last-Modified derived from the scopes' data versions.
+
+    Conditional requests that match get a 304 without calling ``build``; with
+    ``cache_body`` a 200 body is reused for identical requests at the same
+    versions. Pages with pending flash messages are always rendered fresh.
+    """
+    if session.get("_flashes"):
+        return make_response(build())
+    versions = current_versions(scopes)
+    etag = _etag(versions, vary)
+    stamps = [ts for _, ts in versions.values() if ts]
+    last_modified = max(stamps) if stamps else None
+
+    if _not_modified(etag, last_modified):
+        resp = Response(status=304)
+    else:
+        cached = _get_body_cache().get(etag) if cache_body else None
+        if cached is not None:
+            body, mimetype, headers = cached
+            resp = Response(body, mimetype=mimetype, headers=headers)
+        else:
+            resp = make_response(build())
+            if resp.status_code != 200:
+                return resp
+            if cache_body and not resp.is_streamed:
+                keep = {k: v for k, v in resp.headers.items() if k in ("Content-Disposition", "Content-Encoding", "Vary")}
+                _get_body_cache().set(etag, (resp.get_data(), resp.mimetype, keep))
+    resp.set_etag(etag)
+    if last_modified:
+        resp.last_modified = last_modified
+    resp.headers["Cache-Control"] = "private, no-cache"
+    return resp